@@ -0,0 +1,39 @@
+"""
+Building URLs for a large list of images with build_imgix_urls, compared
+with calling get_imgix once per image.
+"""
+import timeit
+
+from common import report, setup_django
+
+
+def main():
+    setup_django(
+        IMGIX_SIGN_KEY='bench-key',
+        IMGIX_DETECT_FORMAT=True,
+        IMGIX_ALIASES={'thumb': {'w': 200, 'h': 200, 'fit': 'crop'}},
+    )
+
+    from django_imgix import build_imgix_urls
+    from django_imgix.templatetags.imgix_tags import get_imgix
+
+    for count in (10000, 100000):
+        paths = [
+            '/media/catalogue/product_{0:06d}.{1}'.format(
+                i, ('jpg', 'png', 'webp')[i % 3])
+            for i in range(count)
+        ]
+
+        loop = min(timeit.repeat(
+            lambda: [get_imgix(path, 'thumb') for path in paths],
+            number=1, repeat=3))
+        batch = min(timeit.repeat(
+            lambda: build_imgix_urls(paths, 'thumb'),
+            number=1, repeat=3))
+
+        report('{0} paths, get_imgix loop'.format(count), loop / count * 1e6)
+        report('{0} paths, build_imgix_urls'.format(count), batch / count * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Per-call cost of get_imgix with the settings/builder cache warm, compared
+with resolving the settings and constructing the builder on every call.
+"""
+from common import measure, report, setup_django
+
+
+def main():
+    setup_django(
+        IMGIX_SIGN_KEY='bench-key',
+        IMGIX_DETECT_FORMAT=True,
+        IMGIX_ALIASES={'thumb': {'w': 200, 'h': 200, 'fit': 'crop'}},
+    )
+
+    from django_imgix.conf import clear_config
+    from django_imgix.templatetags.imgix_tags import get_imgix
+
+    path = '/media/catalogue/product_0001.jpg'
+
+    def cold():
+        clear_config()
+        get_imgix(path, 'thumb')
+
+    def warm():
+        get_imgix(path, 'thumb')
+
+    cold_usec = measure(cold)
+    warm_usec = measure(warm)
+    report('get_imgix, config resolved per call', cold_usec)
+    report('get_imgix, cached config', warm_usec)
+    report('saving per call', cold_usec - warm_usec)
+
+
+if __name__ == '__main__':
+    main()
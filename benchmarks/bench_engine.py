@@ -0,0 +1,45 @@
+"""
+Building 100k URLs with the native URLEngine (IMGIX_URL_ENGINE = 'native'),
+compared with imgix.UrlBuilder, for ASCII and non-ASCII paths, unsigned and
+signed.
+"""
+import timeit
+
+from common import report, setup_django
+
+COUNT = 100000
+SIGN_KEY = 'jUIrLPuMEm2aCRj'
+
+
+def main():
+    setup_django()
+
+    import imgix
+    from django_imgix.engine import URLEngine
+
+    params = {'w': 400, 'h': 300, 'fit': 'crop', 'auto': 'format'}
+    cases = [
+        ('ascii', ['/media/catalogue/product_{0:06d}.jpg'.format(i)
+                   for i in range(COUNT)]),
+        ('non-ascii', [u'/media/catalogue/caf\xe9/product_{0:06d}.jpg'.format(i)
+                       for i in range(COUNT)]),
+    ]
+
+    for sign_key in [None, SIGN_KEY]:
+        upstream = imgix.UrlBuilder('bench.imgix.net', sign_key=sign_key)
+        native = URLEngine('bench.imgix.net', sign_key=sign_key)
+        signed = 'signed' if sign_key else 'unsigned'
+        for name, paths in cases:
+            for label, builder in [('imgix.UrlBuilder', upstream),
+                                   ('URLEngine', native)]:
+                def build(create_url=builder.create_url):
+                    for path in paths:
+                        create_url(path, params)
+
+                seconds = min(timeit.repeat(build, number=1, repeat=3))
+                report('{0}, {1}, {2} x{3}'.format(label, signed, name, COUNT),
+                       seconds / COUNT * 1e6)
+
+
+if __name__ == '__main__':
+    main()
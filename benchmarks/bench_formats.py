@@ -0,0 +1,62 @@
+"""
+Format detection over a corpus of realistic image URLs, compared with the
+previous split/regex implementation of get_fm.
+"""
+import re
+
+from common import measure, report, setup_django
+
+FM_PATTERN = re.compile(r'([^\?]+)')
+
+CORPUS = [
+    '/media/catalogue/product_000123.jpg',
+    '/media/catalogue/product_000123.JPEG',
+    'media/uploads/2021/03/hero-banner.png',
+    '/media/cms/logo.svg',
+    '/media/cms/icons/cart.gif?v=3',
+    '/static/img/placeholder.webp?v=1.4.2',
+    'https://cdn.example.com/assets/img/team.photo.jpg?w=300&dpr=2.0',
+    'https://cdn.example.com/assets/img/hero.png#section.2',
+    '/media/user/42/avatar',
+    '/media/documents.v2/scan',
+    'https://s3.amazonaws.com/bucket/images/IMG_20210403_101112.HEIC',
+    '/media/catalogue/variants/sku-99812-blue-xl.avif',
+]
+
+
+def legacy_get_fm(image_url, matches):
+    image_end = image_url.split('.')[-1]
+    m = FM_PATTERN.match(image_end)
+    if m:
+        fm = m.group(1)
+        try:
+            format = matches[fm]
+            return format
+        except:
+            return False
+    else:
+        return False
+
+
+def main():
+    setup_django()
+
+    from django_imgix.formats import FORMATS, FormatDetector
+
+    detect = FormatDetector({'avif': 'avif', 'heic': 'heic'}).detect
+
+    def legacy():
+        for url in CORPUS:
+            legacy_get_fm(url, FORMATS)
+
+    def current():
+        for url in CORPUS:
+            detect(url)
+
+    count = len(CORPUS)
+    report('legacy split/regex get_fm', measure(legacy) / count)
+    report('FormatDetector', measure(current) / count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start costs, each measured in a new interpreter (median of several runs):
+the ``python -X importtime`` of the django_imgix and imgix modules imported
+by django.setup() and the imgix_tags library, and the time of django.setup()
+and of the first get_imgix call, with and without IMGIX_WARM_UP.
+"""
+import os
+import subprocess
+import sys
+
+from common import ROOT, report
+
+RUNS = 15
+
+SETUP = (
+    "from django.conf import settings; "
+    "settings.configure(INSTALLED_APPS=['django_imgix'], "
+    "IMGIX_DOMAINS='bench.imgix.net', IMGIX_WARM_UP={0}); "
+    "import timeit; import django; "
+)
+
+IMPORT_TAGS = SETUP + (
+    "django.setup(); "
+    "import django_imgix.templatetags.imgix_tags"
+)
+
+FIRST_CALL = SETUP + (
+    "start = timeit.default_timer(); django.setup(); "
+    "setup = timeit.default_timer() - start; "
+    "from django_imgix.templatetags.imgix_tags import get_imgix; "
+    "start = timeit.default_timer(); get_imgix('/media/image.jpg', w=320); "
+    "print(setup * 1e6, (timeit.default_timer() - start) * 1e6)"
+)
+
+
+def run(code, *options):
+    return subprocess.check_output(
+        [sys.executable] + list(options) + ['-c', code], cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=ROOT), stderr=subprocess.STDOUT
+    ).decode('utf-8')
+
+
+def import_time(prefixes):
+    """
+    Return the total self time of the modules whose name starts with one of
+    prefixes.
+    """
+    output = run(IMPORT_TAGS.format(False), '-X', 'importtime')
+    total = 0
+    for line in output.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip().startswith(prefixes):
+            total += int(parts[0].split(':')[1])
+    return total
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    report('import django_imgix and imgix modules',
+           median([import_time(('django_imgix', 'imgix'))
+                   for _ in range(RUNS)]))
+
+    for warm_up in [False, True]:
+        results = [[float(value) for value in run(FIRST_CALL.format(warm_up))
+                    .split()] for _ in range(RUNS)]
+        label = 'IMGIX_WARM_UP = {0}'.format(warm_up)
+        report('django.setup(), ' + label,
+               median([setup for setup, first in results]))
+        report('first get_imgix, ' + label,
+               median([first for setup, first in results]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Throughput of iter_imgix_urls_parallel with 1 to N processes, compared with
+iter_imgix_urls, for signed URLs:
+
+    python benchmarks/bench_parallel.py [images] [max processes]
+"""
+import os
+import sys
+import time
+
+from common import setup_django
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else (
+        os.cpu_count() or 1)
+
+    setup_django(IMGIX_SIGN_KEY='bench-key',
+                 IMGIX_ALIASES={'thumb': {'w': 320, 'h': 240, 'fit': 'crop'}})
+
+    from django_imgix import iter_imgix_urls
+    from django_imgix.parallel import iter_imgix_urls_parallel
+
+    paths = ['/media/catalogue/product_{0:07d}.jpg'.format(i)
+             for i in range(count)]
+
+    def run(label, urls):
+        started = time.time()
+        for _ in urls:
+            pass
+        elapsed = time.time() - started
+        print('{0:<32} {1:>8.2f} s {2:>12,.0f} URLs/s'.format(
+            label, elapsed, count / elapsed))
+        return elapsed
+
+    baseline = run('iter_imgix_urls', iter_imgix_urls(paths, 'thumb'))
+    processes = 1
+    while processes <= max_processes:
+        elapsed = run(
+            '{0} processes'.format(processes),
+            iter_imgix_urls_parallel(paths, 'thumb', processes=processes)
+        )
+        print('{0:>32} {1:.2f}x'.format('', baseline / elapsed))
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main()
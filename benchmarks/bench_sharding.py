@@ -0,0 +1,29 @@
+"""
+Cost of choosing the domain of an image with ShardSelector, plain and
+weighted, and of get_imgix with a single domain and with three shards.
+"""
+from common import measure, report, setup_django
+
+DOMAINS = ['bench-1.imgix.net', 'bench-2.imgix.net', 'bench-3.imgix.net']
+
+
+def main():
+    setup_django(IMGIX_DOMAINS=DOMAINS)
+
+    from django.test.utils import override_settings
+    from django_imgix.sharding import ShardSelector
+    from django_imgix.templatetags.imgix_tags import get_imgix
+
+    path = '/media/catalogue/product_000123.jpg'
+    plain = ShardSelector(DOMAINS)
+    weighted = ShardSelector(DOMAINS, {DOMAINS[0]: 3, DOMAINS[1]: 2})
+
+    report('ShardSelector.index', measure(lambda: plain.index(path)))
+    report('ShardSelector.index, weighted', measure(lambda: weighted.index(path)))
+    report('get_imgix, three shards', measure(lambda: get_imgix(path)))
+    with override_settings(IMGIX_DOMAINS=DOMAINS[0]):
+        report('get_imgix, single domain', measure(lambda: get_imgix(path)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Signing 100k URLs with PrefixSigner, compared with imgix.UrlBuilder's own
+signing (a fresh md5 of the sign key, path and query for every URL).
+"""
+import hashlib
+import timeit
+
+from common import report, setup_django
+
+COUNT = 100000
+SIGN_KEY = 'jUIrLPuMEm2aCRj'
+
+
+def main():
+    setup_django()
+
+    import imgix
+    from django_imgix.signing import PrefixSigner
+
+    paths = ['/media/catalogue/product_{0:06d}.jpg'.format(i)
+             for i in range(COUNT)]
+    params = {'w': 400, 'h': 300, 'fit': 'crop', 'auto': 'format'}
+
+    signer = PrefixSigner(SIGN_KEY)
+    values = [path + '?auto=format&fit=crop&h=300&ixlib=python-1.2.0&w=400'
+              for path in paths]
+
+    def md5_from_scratch():
+        for value in values:
+            hashlib.md5((SIGN_KEY + value).encode('utf-8')).hexdigest()
+
+    def md5_prefix_copy():
+        sign = signer.sign
+        for value in values:
+            sign(value)
+
+    upstream = imgix.UrlBuilder('bench.imgix.net', sign_key=SIGN_KEY)
+    unsigned = imgix.UrlBuilder('bench.imgix.net')
+
+    def upstream_urls():
+        for path in paths:
+            upstream.create_url(path, params)
+
+    def prefix_signer_urls():
+        sign_url = signer.sign_url
+        for path in paths:
+            sign_url(unsigned.create_url(path, params))
+
+    for label, func in [
+            ('signature only, md5 from scratch', md5_from_scratch),
+            ('signature only, PrefixSigner', md5_prefix_copy),
+            ('signed URL, imgix.UrlBuilder', upstream_urls),
+            ('signed URL, UrlBuilder + PrefixSigner', prefix_signer_urls)]:
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        report('{0} x{1}'.format(label, COUNT), seconds / COUNT * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Shared helpers for the django-imgix micro-benchmarks.
+
+The benchmarks are plain scripts; run them from the repository root, e.g.::
+
+    python benchmarks/bench_config_cache.py
+
+``suite.py`` runs the cases of the template tag hot path and writes/compares
+JSON results (see its docstring).
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(**overrides):
+    """
+    Configure a minimal settings module for the benchmarks and set up Django.
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    import django
+    from django.conf import settings
+
+    options = {
+        'IMGIX_DOMAINS': 'bench.imgix.net',
+        'INSTALLED_APPS': ['django_imgix'],
+        'TEMPLATES': [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'APP_DIRS': True,
+        }],
+    }
+    options.update(overrides)
+    settings.configure(**options)
+    django.setup()
+
+
+def measure(func, number=10000, repeat=5):
+    """
+    Return the best observed cost of a single ``func()`` call in microseconds.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def report(label, usec):
+    print('{0:<48} {1:>10.2f} us/call'.format(label, usec))
@@ -0,0 +1,186 @@
+"""
+The benchmark suite for the get_imgix hot path.
+
+Runs every case with plain timeit and writes the results as JSON, which can be
+compared with the results of another commit:
+
+    python benchmarks/suite.py --output before.json
+    git checkout my-branch
+    python benchmarks/suite.py --output after.json --compare before.json
+
+With ``--compare``, the exit status is 1 if any case is slower than in the
+baseline by more than ``--threshold`` (10% by default).
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+from common import ROOT, measure, setup_django
+
+DOMAINS = ['bench-1.imgix.net', 'bench-2.imgix.net', 'bench-3.imgix.net']
+PATH = '/media/catalogue/product_000123.jpg'
+ALIASES = {
+    'thumb': {'w': 320, 'h': 240, 'fit': 'crop', 'auto': 'format'},
+}
+
+
+def direct_inline():
+    from django_imgix.templatetags.imgix_tags import get_imgix
+    return lambda: get_imgix(PATH, w=320, h=240, fit='crop', auto='format')
+
+
+def direct_alias():
+    from django_imgix.templatetags.imgix_tags import get_imgix
+    return lambda: get_imgix(PATH, 'thumb')
+
+
+def render(count, tag):
+    def factory():
+        from django.template import Context, Template
+
+        template = Template(
+            '{% load imgix_tags %}{% for path in paths %}' + tag +
+            '{% endfor %}'
+        )
+        context = {
+            'paths': ['/media/catalogue/product_{0:06d}.jpg'.format(i)
+                      for i in range(count)],
+        }
+        return lambda: template.render(Context(context))
+    return factory
+
+
+# The same <picture> as imgix_picture, with one tag per URL or srcset
+PICTURE_TAGS = (
+    '<picture>' + ''.join(
+        '<source type="image/{0}" srcset="{{% get_imgix_srcset path w=320 '
+        'h=240 fit=\'crop\' fm=\'{0}\' %}}">'.format(fm)
+        for fm in ['avif', 'webp']) +
+    '<img src="{% get_imgix path w=320 h=240 fit=\'crop\' %}" '
+    'srcset="{% get_imgix_srcset path w=320 h=240 fit=\'crop\' %}" alt="">'
+    '</picture>'
+)
+
+# (name, settings, factory, calls per measurement)
+CASES = [
+    ('direct/inline', {}, direct_inline, 10000),
+    ('direct/alias', {}, direct_alias, 10000),
+    ('direct/signed', {'IMGIX_SIGN_KEY': 'bench-key'}, direct_alias, 10000),
+    ('direct/sharded', {'IMGIX_DOMAINS': DOMAINS}, direct_alias, 10000),
+    ('direct/detect-format', {'IMGIX_DETECT_FORMAT': True}, direct_alias,
+     10000),
+    ('direct/web-proxy', {'IMGIX_WEB_PROXY_SOURCE': True}, direct_alias,
+     10000),
+    ('direct/native-engine', {'IMGIX_URL_ENGINE': 'native'}, direct_alias,
+     10000),
+    ('direct/native-engine-signed', {'IMGIX_URL_ENGINE': 'native',
+                                     'IMGIX_SIGN_KEY': 'bench-key'},
+     direct_alias, 10000),
+    ('render/1', {}, render(1, "{% get_imgix path 'thumb' %}"), 2000),
+    ('render/100', {}, render(100, "{% get_imgix path 'thumb' %}"), 50),
+    ('render/1000', {}, render(1000, "{% get_imgix path 'thumb' %}"), 5),
+    ('render/100-inline', {},
+     render(100, "{% get_imgix path w=320 h=240 fit='crop' %}"), 50),
+    ('render/100-literal', {},
+     render(100, "{% get_imgix '/media/logo.png' 'thumb' %}"), 50),
+    ('render/100-picture', {'IMGIX_SRCSET_WIDTHS': [320, 640, 960]},
+     render(100, "{% imgix_picture path w=320 h=240 fit='crop' %}"), 10),
+    ('render/100-picture-tags', {'IMGIX_SRCSET_WIDTHS': [320, 640, 960]},
+     render(100, PICTURE_TAGS), 10),
+]
+
+
+def get_metadata():
+    import django
+    import imgix
+    from django_imgix.templatetags._version import __version__
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'imgix': imgix.__version__,
+        'django_imgix': __version__,
+    }
+
+
+def run(names=None, repeat=5):
+    """
+    Return a dict of the microseconds per call of each case.
+    """
+    from django.test.utils import override_settings
+
+    results = {}
+    for name, overrides, factory, number in CASES:
+        if names and not any(part in name for part in names):
+            continue
+        with override_settings(**overrides):
+            func = factory()
+            func()
+            results[name] = measure(func, number=number, repeat=repeat)
+        print('{0:<32} {1:>12.2f} us/call'.format(name, results[name]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the change of each case against baseline and return the names of
+    those slower by more than threshold (a fraction).
+    """
+    regressions = []
+    print('')
+    for name, usec in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = usec / before - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{0:<32} {1:>12.2f} -> {2:>12.2f} us {3:>+8.1%}{4}'.format(
+            name, before, usec, change, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('cases', nargs='*',
+                        help='only run the cases whose name contains one of '
+                             'these')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare with the results in this file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown reported as a regression (default '
+                             '0.1, i.e. 10%%)')
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args(argv)
+
+    setup_django(IMGIX_DOMAINS=DOMAINS[0], IMGIX_ALIASES=ALIASES)
+    results = run(options.cases, options.repeat)
+
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump({'metadata': get_metadata(), 'results': results},
+                      output, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as baseline:
+            baseline = json.load(baseline)['results']
+        if compare(results, baseline, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
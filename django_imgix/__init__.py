@@ -0,0 +1,10 @@
+import django
+
+from .api import (
+    build_imgix_picture, build_imgix_srcset, build_imgix_url,
+    build_imgix_urls, iter_imgix_urls
+)
+from .lazy import ImgixURL, imgix_url
+
+if django.VERSION < (3, 2):
+    default_app_config = 'django_imgix.apps.DjangoImgixConfig'
@@ -0,0 +1,103 @@
+"""
+Building imgix URLs from async code (e.g. async views under ASGI).
+
+    from django_imgix.aio import abuild_imgix_url, abuild_imgix_urls
+
+    url = await abuild_imgix_url(product.image.url, 'thumb')
+    urls = await abuild_imgix_urls(paths, w=640)
+
+These take the same arguments as build_imgix_url and build_imgix_urls. The
+shared URL cache (IMGIX_CACHE) is accessed through the async cache API when
+the cache backend has one, and batches of more than OFFLOAD_THRESHOLD URLs
+to build are built in a worker thread, so the event loop isn't blocked. With
+IMGIX_METRICS, the URLs are recorded in the metrics of the request.
+"""
+from timeit import default_timer
+
+from asgiref.sync import sync_to_async
+
+from .api import _iter_items, get_arguments, get_image_arguments
+from .conf import get_config
+
+# Number of URLs to build above which they are built in a worker thread
+OFFLOAD_THRESHOLD = 200
+
+
+async def abuild_imgix_url(image_url, alias=None, wh=None, **kwargs):
+    """
+    Return the imgix URL for an image, like build_imgix_url.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    urls = await acreate_urls(config, [(path, arguments)])
+    return urls[0]
+
+
+async def abuild_imgix_urls(paths, alias=None, wh=None, **kwargs):
+    """
+    Return a list of the imgix URLs for an iterable of images, all built with
+    the same alias or arguments, like build_imgix_urls.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    items = list(_iter_items(config, paths, arguments))
+    return await acreate_urls(config, items)
+
+
+async def acreate_urls(config, items):
+    """
+    Return the URLs for a list of ``(path, arguments)`` pairs, like
+    ImgixConfig.create_urls.
+    """
+    shared_cache = config.shared_cache
+    if shared_cache is None:
+        # create_urls records its own metrics
+        return await _run(len(items), config.create_urls, items)
+
+    metrics = None
+    if config.metrics:
+        from .metrics import get_current
+        metrics = get_current()
+    if metrics is None:
+        return await _acreate_cached_urls(config, shared_cache, items)
+
+    started = default_timer()
+    try:
+        return await _acreate_cached_urls(config, shared_cache, items)
+    finally:
+        metrics.urls += len(items)
+        metrics.time += default_timer() - started
+
+
+async def _acreate_cached_urls(config, shared_cache, items):
+    urls, missing = config.get_cached_urls(items)
+    if not missing:
+        return urls
+
+    cache = shared_cache.cache
+    keys = list(missing)
+    if hasattr(cache, 'aget_many'):
+        found = await cache.aget_many(keys)
+    else:
+        found = await sync_to_async(cache.get_many)(keys)
+
+    count = len(missing) - len(found)
+    built = await _run(count, config.build_missing_urls, urls, missing, found)
+
+    if built:
+        if hasattr(cache, 'aset_many'):
+            await cache.aset_many(built, shared_cache.timeout)
+        else:
+            await sync_to_async(cache.set_many)(built, shared_cache.timeout)
+    return urls
+
+
+async def _run(count, func, *args):
+    """
+    Call func, which builds count URLs, in a worker thread if that is more
+    than OFFLOAD_THRESHOLD.
+    """
+    if count > OFFLOAD_THRESHOLD:
+        return await sync_to_async(func, thread_sensitive=False)(*args)
+    return func(*args)
@@ -0,0 +1,115 @@
+"""
+Validation and compilation of IMGIX_ALIASES.
+
+Aliases are compiled once into immutable CompiledAlias objects, so a tag call
+never looks into (or mutates) the dicts held in settings.
+"""
+from base64 import urlsafe_b64encode
+try:
+    from urllib import quote
+except ImportError:
+    # Python 3 location
+    from urllib.parse import quote
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .normalize import normalize_params
+
+try:
+    string_types = (basestring,)
+except NameError:
+    string_types = (str,)
+
+VALUE_TYPES = string_types + (int, float, bool, type(None))
+
+
+def encode_param(key, value):
+    """
+    Return the ``key=value`` query string pair for a parameter, encoded the
+    same way imgix.UrlBuilder encodes it, or None if the parameter is omitted.
+    """
+    if value is None or value is False:
+        return None
+    if isinstance(value, (int, float)):
+        value = str(value)
+    if key.endswith('64'):
+        value = urlsafe_b64encode(value.encode('utf-8'))
+        value = value.replace(b'=', b'').decode('ascii')
+    return quote(key, '') + '=' + quote(value, '')
+
+
+def encode_query(params):
+    """
+    Return the sorted, URL-escaped query string for a sequence of
+    ``(key, value)`` pairs.
+    """
+    pairs = (encode_param(key, value) for key, value in sorted(params))
+    return '&'.join(pair for pair in pairs if pair is not None)
+
+
+class CompiledAlias(object):
+    """
+    The parameters of one alias, frozen into a sorted tuple of ``(key,
+    value)`` pairs.
+    """
+    __slots__ = ('name', 'params')
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = tuple(sorted(params.items()))
+
+    def __repr__(self):
+        return '<CompiledAlias {0}: {1}>'.format(
+            self.name, encode_query(self.params))
+
+    def arguments(self):
+        """
+        Return a new dict of the alias parameters, safe for the caller to
+        modify.
+        """
+        return dict(self.params)
+
+
+def compile_aliases(aliases, normalize=False, size_buckets=None):
+    """
+    Validate IMGIX_ALIASES and return a dict of CompiledAlias by name, or None
+    if no aliases are set.
+
+    With normalize (True or 'strict', see IMGIX_NORMALIZE) the parameters are
+    normalized first, and with size_buckets (a SizeBuckets) their sizes are
+    snapped to its ladders.
+    """
+    if not aliases:
+        return None
+    if not isinstance(aliases, dict):
+        raise ImproperlyConfigured(
+            "IMGIX_ALIASES must be a dict of alias names to parameters"
+        )
+
+    compiled = {}
+    for name, params in aliases.items():
+        if not isinstance(params, dict):
+            raise ImproperlyConfigured(
+                "Alias {0} in IMGIX_ALIASES must be a dict of "
+                "parameters".format(name)
+            )
+        for key, value in params.items():
+            if not isinstance(key, string_types):
+                raise ImproperlyConfigured(
+                    "Alias {0} in IMGIX_ALIASES has a non-string parameter "
+                    "name {1!r}".format(name, key)
+                )
+            if not isinstance(value, VALUE_TYPES):
+                raise ImproperlyConfigured(
+                    "Alias {0} in IMGIX_ALIASES has an invalid value {1!r} "
+                    "for parameter {2}".format(name, value, key)
+                )
+        if normalize:
+            params = normalize_params(
+                params, normalize == 'strict',
+                'Alias {0} in IMGIX_ALIASES'.format(name)
+            )
+        if size_buckets is not None:
+            params = size_buckets.apply(params)
+        compiled[name] = CompiledAlias(name, params)
+    return compiled
@@ -0,0 +1,331 @@
+"""
+Building imgix URLs from Python code.
+
+``get_imgix`` is a thin wrapper around build_imgix_url. build_imgix_urls and
+iter_imgix_urls resolve the settings, alias and size arguments once and reuse
+them for every image of a batch.
+"""
+import re
+try:
+    from urlparse import urlparse
+except ImportError:
+    # Python 3 location
+    from urllib.parse import urlparse
+
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateSyntaxError
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .conf import get_config
+from .formats import FORMATS, FormatDetector, get_picture_formats
+from .normalize import normalize_params
+from .templatetags._version import __version__
+
+# Number of images looked up in the shared URL cache at once
+CACHE_CHUNK_SIZE = 500
+
+WH_PATTERN = re.compile(r'(\d+)x(\d+)$')
+
+# Not used any more (see FormatDetector), kept for code importing them
+FM_PATTERN = re.compile(r'([^\?]+)')
+FM_MATCHES = FORMATS
+
+_detect_fm = FormatDetector().detect
+
+
+def get_kwargs(alias, aliases, kwargs):
+
+    # Check if we are using an alias or inline arguments
+    if not alias:
+        return kwargs
+    elif not aliases:
+        raise ImproperlyConfigured(
+            "No aliases set. Please set IMGIX_ALIASES in settings.py"
+        )
+    elif alias not in aliases:
+        raise ImproperlyConfigured(
+            "Alias {0} not found in IMGIX_ALIASES".format(alias)
+        )
+    else:
+        # A fresh dict, so the frozen alias is never modified
+        return aliases[alias].arguments()
+
+
+def get_fm(image_url):
+    # Detection from the default table only; see ImgixConfig.format_detector
+    return _detect_fm(image_url) or False
+
+
+def get_arguments(config, alias=None, wh=None, kwargs=None):
+    """
+    Return the imgix parameters for an alias or inline arguments, which are
+    the same for every image they are applied to.
+    """
+    kwargs = {} if kwargs is None else kwargs
+
+    # Has the wh argument been passed? If yes,
+    # set w and h arguments accordingly
+    if wh:
+        size = wh
+        if isinstance(size, str):
+            m = WH_PATTERN.match(size)
+            if m:
+                w = int(m.group(1))
+                h = int(m.group(2))
+                if w > 0:
+                    kwargs['w'] = int(m.group(1))
+                if h > 0:
+                    kwargs['h'] = int(m.group(2))
+            else:
+                raise TemplateSyntaxError(
+                    "%r is not a valid size." % size
+                )
+
+    # Aliases are normalized and bucketed when they are compiled
+    if not alias:
+        if config.normalize:
+            kwargs = normalize_params(kwargs, config.normalize == 'strict')
+        if config.size_buckets is not None:
+            kwargs = config.size_buckets.apply(kwargs)
+
+    arguments = get_kwargs(alias, config.aliases, kwargs)
+
+    # URLs should append an 'ixlib=django-<version_number>' parameter
+    arguments['ixlib'] = "django-" + __version__
+    return arguments
+
+
+def get_image_arguments(config, image_url, arguments):
+    """
+    Return the path and parameters to build the URL of one image with.
+    """
+    # Is format detection on? If yes, use the appropriate image format.
+    if config.format_detect and 'fm' not in arguments:
+        fm = config.format_detector.detect(image_url)
+        if fm:
+            arguments = dict(arguments, fm=fm)
+
+    # Take only the relative path of the URL if the source is not a Web Proxy Source
+    if not config.web_proxy:
+        image_url = urlparse(image_url).path
+
+    return image_url, arguments
+
+
+def build_imgix_url(image_url, alias=None, wh=None, **kwargs):
+    """
+    Return the imgix URL for an image, taking the same arguments as the
+    ``get_imgix`` template tag.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    return config.create_url(path, arguments)
+
+
+def build_imgix_srcset(image_url, alias=None, wh=None, widths=None,
+                       **kwargs):
+    """
+    Return a ``srcset`` attribute value with a URL for each width of the
+    ladder (IMGIX_SRCSET_WIDTHS by default), taking the same arguments as the
+    ``get_imgix`` template tag.
+
+    If both ``w`` and ``h`` are given, ``h`` is scaled with each width to
+    keep the aspect ratio.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    widths, items = get_srcset_items(config, path, arguments, widths)
+    return format_srcset(widths, config.create_urls(items))
+
+
+def build_imgix_picture(image_url, alias=None, wh=None, widths=None,
+                        formats=None, attrs=None, **kwargs):
+    """
+    Return the HTML of a ``<picture>`` element with a ``<source>`` and its
+    srcset for each format (IMGIX_PICTURE_FORMATS by default) and a fallback
+    ``<img>``, taking the same arguments as ``build_imgix_srcset``. attrs are
+    the HTML attributes of the ``<img>`` (``sizes`` is also set on the
+    sources).
+
+    The arguments are resolved once for all the sources, and all the URLs
+    are looked up in the shared cache at once.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    widths, sources, items = get_picture_items(
+        config, path, arguments, widths, formats)
+
+    all_items = [(path, arguments)] + items
+    for mime_type, source_items in sources:
+        all_items.extend(source_items)
+    urls = config.create_urls(all_items)
+
+    start = 1 + len(items)
+    srcsets = []
+    for mime_type, source_items in sources:
+        stop = start + len(source_items)
+        srcsets.append((mime_type, format_srcset(widths, urls[start:stop])))
+        start = stop
+    return format_picture(srcsets, urls[0],
+                          format_srcset(widths, urls[1:1 + len(items)]),
+                          attrs)
+
+
+def iter_imgix_urls(paths, alias=None, wh=None, **kwargs):
+    """
+    Return a generator of the imgix URLs for an iterable of images, all built
+    with the same alias or arguments.
+
+    The settings, alias and size are resolved (and any error raised) before
+    the first URL is built.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    return _iter_urls(config, paths, arguments)
+
+
+def build_imgix_urls(paths, alias=None, wh=None, **kwargs):
+    """
+    Return a list of the imgix URLs for an iterable of images, all built with
+    the same alias or arguments.
+    """
+    return list(iter_imgix_urls(paths, alias, wh, **kwargs))
+
+
+def _iter_urls(config, paths, arguments):
+    items = _iter_items(config, paths, arguments)
+    if config.shared_cache is None:
+        create_url = config.create_url
+        for path, image_arguments in items:
+            yield create_url(path, image_arguments)
+    else:
+        # One round-trip to the shared cache per chunk of images
+        for chunk in _chunks(items, CACHE_CHUNK_SIZE):
+            for url in config.create_urls(chunk):
+                yield url
+
+
+def _iter_items(config, paths, arguments):
+    web_proxy = config.web_proxy
+    detect_format = config.format_detect and 'fm' not in arguments
+    detect_fm = config.format_detector.detect
+
+    # The parameters for each detected format are built once per batch
+    by_format = {}
+
+    for image_url in paths:
+        image_arguments = arguments
+        if detect_format:
+            fm = detect_fm(image_url)
+            if fm:
+                image_arguments = by_format.get(fm)
+                if image_arguments is None:
+                    image_arguments = by_format[fm] = dict(arguments, fm=fm)
+
+        if not web_proxy:
+            image_url = urlparse(image_url).path
+
+        yield image_url, image_arguments
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_widths(config, widths=None):
+    if widths is None:
+        return config.srcset_widths
+    if isinstance(widths, str):
+        widths = widths.split(',')
+    try:
+        return tuple(int(width) for width in widths)
+    except ValueError:
+        raise TemplateSyntaxError(
+            "%r is not a valid list of widths." % (widths,)
+        )
+
+
+def get_srcset_items(config, path, arguments, widths=None):
+    """
+    Return the widths of a srcset and the ``(path, arguments)`` to build the
+    URL for each of them with.
+    """
+    ratio = None
+    try:
+        if 'w' in arguments and 'h' in arguments:
+            ratio = float(arguments['h']) / float(arguments['w'])
+    except (TypeError, ValueError, ZeroDivisionError):
+        pass
+
+    widths = get_widths(config, widths)
+    items = []
+    for width in widths:
+        width_arguments = dict(arguments, w=width)
+        if ratio is not None:
+            width_arguments['h'] = int(round(width * ratio))
+        items.append((path, width_arguments))
+    return widths, items
+
+
+def get_picture_items(config, path, arguments, widths=None, formats=None):
+    """
+    Return the widths of the srcsets of a ``<picture>``, the MIME type and
+    ``(path, arguments)`` items of each of its sources, and the items of the
+    srcset of its fallback ``<img>``.
+    """
+    widths, items = get_srcset_items(config, path, arguments, widths)
+    if formats is None:
+        picture_formats = config.picture_formats
+    else:
+        try:
+            picture_formats = get_picture_formats(formats)
+        except ValueError as e:
+            raise TemplateSyntaxError(str(e))
+
+    sources = []
+    for fm, mime_type in picture_formats:
+        sources.append((mime_type, [
+            (item_path, dict(item_arguments, fm=fm))
+            for item_path, item_arguments in items
+        ]))
+    return widths, sources, items
+
+
+def format_picture(sources, src, srcset, attrs=None):
+    """
+    Return the HTML of a ``<picture>`` from the ``(MIME type, srcset)`` of
+    each of its sources and the src, srcset and other attributes of its
+    fallback ``<img>``. URLs are output as they are, like get_imgix does.
+    """
+    attrs = dict(attrs or {})
+    sizes = attrs.pop('sizes', None)
+    attrs.setdefault('alt', '')
+
+    sizes_attr = ' sizes="' + escape(sizes) + '"' if sizes else ''
+    parts = ['<picture>']
+    for mime_type, source_srcset in sources:
+        parts += ['<source type="', escape(mime_type), '" srcset="',
+                  source_srcset, '"', sizes_attr, '>']
+    parts += ['<img src="', src, '" srcset="', srcset, '"', sizes_attr]
+    for name, value in sorted(attrs.items()):
+        if value is not None:
+            parts += [' ', escape(name), '="', escape(value), '"']
+    parts.append('></picture>')
+    return mark_safe(''.join(parts))
+
+
+def format_srcset(widths, urls):
+    return ', '.join(
+        url + ' ' + str(width) + 'w' for width, url in zip(widths, urls)
+    )
@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+from .conf import get_config, get_settings_aliases
+
+
+class DjangoImgixConfig(AppConfig):
+    name = 'django_imgix'
+    verbose_name = 'imgix'
+
+    def ready(self):
+        if getattr(settings, 'IMGIX_WARM_UP', False):
+            # Resolve the settings, aliases and builders now rather than in
+            # the first request of each process
+            get_config().warm_up()
+        else:
+            # Report malformed aliases at startup rather than on first
+            # render; the configuration reuses them
+            get_settings_aliases()
@@ -0,0 +1,132 @@
+"""
+Snapping of image sizes to a ladder of buckets, for IMGIX_SIZE_BUCKETS.
+
+    IMGIX_SIZE_BUCKETS = {
+        'w': [160, 320, 640, 960, 1280, 1920],
+        'dpr': [1, 2, 3],
+    }
+
+``w``, ``h`` and ``dpr`` are rounded up to the next value of their ladder, so
+that arbitrary sizes only ever produce a bounded number of variants of each
+image. When ``w`` (or, without a ladder for ``w``, ``h``) is snapped and both
+are given, the other one is scaled to keep the aspect ratio. Sizes larger than
+the last value of a ladder, and relative sizes (below 1), are left as they are.
+"""
+import threading
+from bisect import bisect_left
+
+from django.core.exceptions import ImproperlyConfigured
+
+BUCKET_PARAMS = ('w', 'h', 'dpr')
+
+# Distinct sizes remembered for the statistics
+MAX_TRACKED_SIZES = 10000
+
+
+def _size(value):
+    """
+    Return an absolute size as a number, or None.
+    """
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 1 else None
+
+
+def _number(value):
+    return int(value) if float(value).is_integer() else value
+
+
+class SizeBuckets(object):
+    """
+    The ladders of IMGIX_SIZE_BUCKETS, and statistics of the sizes they were
+    applied to.
+    """
+
+    def __init__(self, ladders):
+        if not isinstance(ladders, dict) or not all(
+            key in BUCKET_PARAMS and values and all(
+                _size(value) is not None for value in values)
+            for key, values in ladders.items()
+        ):
+            raise ImproperlyConfigured(
+                "IMGIX_SIZE_BUCKETS must be a dict of 'w', 'h' or 'dpr' to "
+                "lists of sizes"
+            )
+        self.ladders = dict(
+            (key, tuple(sorted(_number(value) for value in values)))
+            for key, values in ladders.items()
+        )
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def snap(self, key, value):
+        """
+        Return the bucket of a size for a parameter with a ladder.
+        """
+        ladder = self.ladders[key]
+        index = bisect_left(ladder, value)
+        if index == len(ladder):
+            return _number(value)
+        return ladder[index]
+
+    def apply(self, params):
+        """
+        Return a new dict of params with their sizes snapped to the ladders.
+        """
+        result = dict(params)
+        w = _size(params.get('w'))
+        h = _size(params.get('h'))
+        dpr = _size(params.get('dpr'))
+
+        if w is not None and 'w' in self.ladders:
+            result['w'] = self.snap('w', w)
+            if h is not None:
+                result['h'] = int(round(h * result['w'] / w))
+        elif h is not None and 'h' in self.ladders:
+            result['h'] = self.snap('h', h)
+            if w is not None:
+                result['w'] = int(round(w * result['h'] / h))
+        if dpr is not None and 'dpr' in self.ladders:
+            result['dpr'] = self.snap('dpr', dpr)
+
+        self.record(params, result)
+        return result
+
+    def record(self, params, result):
+        size = tuple(params.get(key) for key in BUCKET_PARAMS)
+        if size == (None, None, None):
+            return
+        if size in self._sizes or len(self._sizes) >= MAX_TRACKED_SIZES:
+            return
+        with self._lock:
+            self._sizes[size] = tuple(
+                result.get(key) for key in BUCKET_PARAMS)
+
+    def info(self):
+        """
+        Return the number of distinct sizes seen, of variants they were
+        snapped to, and of sizes collapsed into another variant.
+        """
+        sizes = len(self._sizes)
+        variants = len(set(self._sizes.values()))
+        return {
+            'sizes': sizes,
+            'variants': variants,
+            'collapsed': sizes - variants,
+        }
+
+
+def size_bucket_info():
+    """
+    Return the statistics of IMGIX_SIZE_BUCKETS, or None if it isn't set.
+    """
+    from .conf import get_config
+
+    size_buckets = get_config().size_buckets
+    if size_buckets is None:
+        return None
+    return size_buckets.info()
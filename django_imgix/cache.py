@@ -0,0 +1,127 @@
+"""
+Caching of generated imgix URLs, in process (LRUCache) and in one of the
+caches of the CACHES setting (SharedURLCache).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from django.core.cache import caches
+except ImportError:
+    # Django < 1.7
+    from django.core.cache import get_cache
+else:
+    def get_cache(alias):
+        return caches[alias]
+try:
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+except ImportError:
+    # Django < 1.6, where a timeout of None is the default one
+    DEFAULT_TIMEOUT = None
+
+from .aliases import encode_query
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping holding at most ``maxsize`` entries, discarding the
+    least recently used one when full. Hits, misses and evictions are counted.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # Re-insert to mark the entry as most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+            elif len(self._data) >= self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            self._data[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+
+class SharedURLCache(object):
+    """
+    Generated URLs stored in a Django cache, shared by every process using it
+    and surviving restarts.
+
+    Keys are prefixed with a fingerprint of the settings the URLs depend on
+    and of the library versions, so changing either never serves stale URLs.
+    """
+
+    def __init__(self, alias, fingerprint, timeout=DEFAULT_TIMEOUT):
+        self.alias = alias
+        self.prefix = 'imgix:{0}:'.format(fingerprint)
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return get_cache(self.alias)
+
+    def make_key(self, path, arguments):
+        """
+        Return the cache key for a path and its (final) imgix parameters.
+        """
+        value = path + '?' + encode_query(arguments.items())
+        return self.prefix + hashlib.md5(value.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set(self, key, url):
+        self.cache.set(key, url, self.timeout)
+
+    def set_many(self, urls):
+        self.cache.set_many(urls, self.timeout)
+
+
+def url_cache_info():
+    """
+    Return the counters of the URL cache, or None if IMGIX_URL_CACHE_SIZE is
+    not set (or caching is not possible with the shard strategy in use).
+    """
+    from .conf import get_config
+
+    url_cache = get_config().url_cache
+    if url_cache is None:
+        return None
+    return url_cache.info()
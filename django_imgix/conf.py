@@ -0,0 +1,493 @@
+"""
+Resolution of the IMGIX_* settings.
+
+Reading the settings and constructing an ``imgix.UrlBuilder`` is the same
+work for every image, so it is done once and the result is shared by every
+call to ``get_imgix`` in the process. The cached configuration is thrown
+away whenever an IMGIX_* setting changes (e.g. via ``override_settings``).
+
+The imgix library and the modules of optional features are only imported
+when the configuration is first resolved (or when IMGIX_WARM_UP is set, when
+the app is ready), so that loading the template tags stays cheap.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.dispatch import receiver
+try:
+    from django.utils.module_loading import import_string
+except ImportError:
+    # Django < 1.7
+    from importlib import import_module
+
+    def import_string(dotted_path):
+        module_path, name = dotted_path.rsplit('.', 1)
+        return getattr(import_module(module_path), name)
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    # Django < 1.8 location
+    from django.test.signals import setting_changed
+
+from .aliases import compile_aliases
+from .cache import DEFAULT_TIMEOUT, LRUCache, SharedURLCache
+from .formats import FormatDetector, get_picture_formats
+from .sharding import CycleSelector, ShardSelector
+from .templatetags._version import __version__
+
+
+def get_settings_variables():
+    try:
+        use_https = settings.IMGIX_HTTPS
+    except AttributeError:
+        use_https = True
+    try:
+        sign_key = settings.IMGIX_SIGN_KEY
+    except AttributeError:
+        sign_key = None
+    try:
+        shard_strategy = settings.IMGIX_SHARD_STRATEGY
+    except AttributeError:
+        shard_strategy = None
+    try:
+        aliases = settings.IMGIX_ALIASES
+    except AttributeError:
+        aliases = None
+    try:
+        format_detect = settings.IMGIX_DETECT_FORMAT
+    except AttributeError:
+        format_detect = False
+    try:
+        web_proxy = settings.IMGIX_WEB_PROXY_SOURCE
+    except AttributeError:
+        web_proxy = False
+    return shard_strategy, sign_key, use_https, aliases, format_detect, web_proxy
+
+
+SRCSET_MIN_WIDTH = 100
+SRCSET_MAX_WIDTH = 8192
+SRCSET_TOLERANCE = 0.08
+
+
+def get_srcset_widths(min_width=SRCSET_MIN_WIDTH, max_width=SRCSET_MAX_WIDTH,
+                      tolerance=SRCSET_TOLERANCE):
+    """
+    Return the ladder of widths from min_width to max_width in which each
+    width is at most ``2 * tolerance`` larger than the previous one.
+    """
+    if not 0 < min_width <= max_width or tolerance <= 0:
+        raise ImproperlyConfigured(
+            "IMGIX_SRCSET_MIN_WIDTH, IMGIX_SRCSET_MAX_WIDTH and "
+            "IMGIX_SRCSET_TOLERANCE must be positive, with the minimum "
+            "width not larger than the maximum"
+        )
+    widths = []
+    width = float(min_width)
+    while width < max_width:
+        widths.append(int(round(width)))
+        width *= 1 + tolerance * 2
+    widths.append(int(max_width))
+    return tuple(widths)
+
+
+def get_url_cache_key(path, arguments):
+    """
+    Return the LRU cache key for a path and its parameters, or None if the
+    parameters can't be part of a key.
+
+    The type of each value is part of the key: 70, 70.0 and True == 1 are
+    equal in Python but encoded differently in the URL.
+    """
+    key = (path, tuple(sorted(
+        (name, value.__class__, value) for name, value in arguments.items()
+    )))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def get_cache_alias():
+    alias = getattr(settings, 'IMGIX_CACHE', None)
+    if alias and alias not in settings.CACHES:
+        raise ImproperlyConfigured(
+            "IMGIX_CACHE {0} is not one of the caches in CACHES".format(alias)
+        )
+    return alias
+
+
+URL_ENGINES = {
+    'imgix': 'imgix.UrlBuilder',
+    'native': 'django_imgix.engine.URLEngine',
+}
+
+
+class ImgixConfig(object):
+    """
+    The effective imgix settings and the URL builders configured from them.
+    """
+
+    def __init__(self, domains, shard_strategy=None, sign_key=None,
+                 use_https=True, aliases=None, format_detect=False,
+                 web_proxy=False, url_cache_size=0, srcset_widths=None,
+                 formats=None, cache=None, cache_timeout=DEFAULT_TIMEOUT,
+                 signer=None, shard_weights=None, metrics=False,
+                 metrics_callback=None, normalize=False, size_buckets=None,
+                 url_engine='imgix', manifest=None, picture_formats=None):
+        self.domains = domains
+        self.shard_strategy = shard_strategy
+        self.shard_weights = shard_weights
+        self.sign_key = sign_key
+        self.use_https = use_https
+        self.normalize = normalize
+        self.size_buckets, self.aliases = get_compiled_aliases(
+            aliases, normalize, size_buckets)
+        self.format_detect = format_detect
+        self.format_detector = FormatDetector(formats)
+        self.web_proxy = web_proxy
+        self.srcset_widths = tuple(srcset_widths or get_srcset_widths())
+        try:
+            self.picture_formats = get_picture_formats(picture_formats)
+        except ValueError as e:
+            raise ImproperlyConfigured("IMGIX_PICTURE_FORMATS: {0}".format(e))
+
+        # With a signer, URLs are built unsigned and signed by it instead
+        self.signer = None
+        if sign_key and signer:
+            if not callable(signer):
+                signer = import_string(signer)
+            self.signer = signer(sign_key)
+
+        args = {'use_https': use_https}
+        if sign_key and self.signer is None:
+            args['sign_key'] = sign_key
+
+        try:
+            engine = import_string(URL_ENGINES[url_engine])
+        except KeyError:
+            raise ImproperlyConfigured(
+                "IMGIX_URL_ENGINE must be one of {0}".format(
+                    ', '.join(repr(name) for name in sorted(URL_ENGINES)))
+            )
+        self.url_engine = url_engine
+
+        # One builder per domain; the domain of each image is chosen here,
+        # not by the builder, so that it is stable across calls and processes
+        if not isinstance(domains, (list, tuple)):
+            domains = [domains]
+        self.builders = tuple(
+            engine(domain, **args) for domain in domains
+        )
+        self.builder = self.builders[0]
+
+        self.shard_selector = None
+        if len(domains) > 1:
+            from imgix.constants import (
+                SHARD_STRATEGY_CRC, SHARD_STRATEGY_CYCLE
+            )
+            if shard_strategy in (None, SHARD_STRATEGY_CRC):
+                self.shard_selector = ShardSelector(domains, shard_weights)
+            elif shard_strategy == SHARD_STRATEGY_CYCLE:
+                self.shard_selector = CycleSelector(domains)
+            else:
+                raise ImproperlyConfigured(
+                    "IMGIX_SHARD_STRATEGY must be '{0}' or '{1}'".format(
+                        SHARD_STRATEGY_CRC, SHARD_STRATEGY_CYCLE)
+                )
+
+        self.fingerprint = self.get_fingerprint()
+
+        # A cached URL must be the one the builder would produce again, so
+        # URLs are only cached when the shard is a function of the path.
+        self.url_cache = None
+        self.shared_cache = None
+        self.manifest = None
+        if self.is_deterministic():
+            if manifest:
+                from .manifest import URLManifest
+                self.manifest = URLManifest(manifest, self.fingerprint)
+            if url_cache_size:
+                self.url_cache = LRUCache(url_cache_size)
+            if cache:
+                self.shared_cache = SharedURLCache(
+                    cache, self.fingerprint, cache_timeout)
+
+        self.metrics = metrics
+        if metrics_callback and not callable(metrics_callback):
+            metrics_callback = import_string(metrics_callback)
+        self.metrics_callback = metrics_callback
+        if metrics:
+            from .metrics import instrument
+            instrument(self)
+
+    def get_fingerprint(self):
+        """
+        Return a short hash of everything, other than the path and the
+        parameters, that the URL of an image depends on.
+        """
+        import imgix
+
+        parts = [
+            __version__,
+            imgix.__version__,
+            repr(self.domains),
+            repr(self.use_https),
+            self.sign_key or '',
+            self.shard_strategy or '',
+            repr(sorted((self.shard_weights or {}).items())),
+        ]
+        value = '\x00'.join(parts).encode('utf-8')
+        return hashlib.md5(value).hexdigest()[:12]
+
+    def is_deterministic(self):
+        """
+        Whether the same path and arguments always produce the same URL.
+        """
+        return (
+            self.shard_selector is None or self.shard_selector.deterministic
+        )
+
+    def build_url(self, path, arguments):
+        """
+        Build (and sign) a URL, bypassing the URL caches.
+        """
+        shard_selector = self.shard_selector
+        if shard_selector is None:
+            builder = self.builder
+        else:
+            builder = self.builders[shard_selector.index(path)]
+
+        url = builder.create_url(path, arguments)
+        if self.signer is not None:
+            url = self.signer.sign_url(url)
+        return url
+
+    def warm_up(self):
+        """
+        Do the work otherwise left to the first URLs: build one with each
+        builder, importing what they use, and load the manifest.
+        """
+        for builder in self.builders:
+            url = builder.create_url('/', {})
+            if self.signer is not None:
+                self.signer.sign_url(url)
+        if self.manifest is not None:
+            self.manifest.get(None)
+
+    def create_url(self, path, arguments):
+        url_cache = self.url_cache
+        shared_cache = self.shared_cache
+        manifest = self.manifest
+        if url_cache is None and shared_cache is None and manifest is None:
+            return self.build_url(path, arguments)
+
+        key = None
+        if url_cache is not None or manifest is not None:
+            key = get_url_cache_key(path, arguments)
+            if key is not None:
+                url = self.get_prebuilt_url(key)
+                if url is not None:
+                    return url
+
+        if shared_cache is not None:
+            shared_key = shared_cache.make_key(path, arguments)
+            url = shared_cache.get(shared_key)
+            if url is None:
+                url = self.build_url(path, arguments)
+                shared_cache.set(shared_key, url)
+        else:
+            url = self.build_url(path, arguments)
+
+        if key is not None and url_cache is not None:
+            url_cache.set(key, url)
+        return url
+
+    def get_prebuilt_url(self, key):
+        """
+        Return the URL for a URL cache key from the manifest or the in-process
+        URL cache, or None.
+        """
+        if self.manifest is not None:
+            url = self.manifest.get(key)
+            if url is not None:
+                return url
+        if self.url_cache is not None:
+            return self.url_cache.get(key)
+        return None
+
+    def create_urls(self, items):
+        """
+        Return the URLs for a sequence of ``(path, arguments)`` pairs, looking
+        up all of them in the shared cache at once.
+        """
+        shared_cache = self.shared_cache
+        if shared_cache is None:
+            return [self.create_url(path, arguments)
+                    for path, arguments in items]
+
+        urls, missing = self.get_cached_urls(items)
+        if missing:
+            found = shared_cache.get_many(list(missing))
+            built = self.build_missing_urls(urls, missing, found)
+            if built:
+                shared_cache.set_many(built)
+        return urls
+
+    def get_cached_urls(self, items):
+        """
+        Look up ``(path, arguments)`` pairs in the manifest and the in-process
+        URL cache.
+
+        Return the list of their URLs, None for those that weren't found, and
+        a dict of the shared cache key of each of these to its entries.
+        """
+        lookup = self.url_cache is not None or self.manifest is not None
+        make_key = self.shared_cache.make_key
+        urls = [None] * len(items)
+        missing = {}
+        for index, (path, arguments) in enumerate(items):
+            key = None
+            if lookup:
+                key = get_url_cache_key(path, arguments)
+                if key is not None:
+                    url = self.get_prebuilt_url(key)
+                    if url is not None:
+                        urls[index] = url
+                        continue
+            missing.setdefault(make_key(path, arguments), []).append(
+                (index, path, arguments, key))
+        return urls, missing
+
+    def build_missing_urls(self, urls, missing, found):
+        """
+        Fill in urls from the URLs found in the shared cache, building those
+        that weren't, and return a dict of the shared cache key of each
+        built URL to it.
+        """
+        url_cache = self.url_cache
+        built = {}
+        for shared_key, entries in missing.items():
+            url = found.get(shared_key)
+            if url is None:
+                index, path, arguments, key = entries[0]
+                url = built[shared_key] = self.build_url(path, arguments)
+            for index, path, arguments, key in entries:
+                urls[index] = url
+                if key is not None and url_cache is not None:
+                    url_cache.set(key, url)
+        return built
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**get_config_options())
+
+
+def get_config_options():
+    """
+    Return the arguments of ImgixConfig for the current settings.
+    """
+    try:
+        domains = settings.IMGIX_DOMAINS
+    except AttributeError:
+        raise ImproperlyConfigured(
+            "IMGIX_DOMAINS not set in settings.py"
+        )
+    (shard_strategy, sign_key, use_https, aliases, format_detect,
+     web_proxy) = get_settings_variables()
+    return dict(
+        domains=domains,
+        shard_strategy=shard_strategy,
+        sign_key=sign_key,
+        use_https=use_https,
+        aliases=aliases,
+        format_detect=format_detect,
+        web_proxy=web_proxy,
+        url_cache_size=getattr(settings, 'IMGIX_URL_CACHE_SIZE', 0),
+        srcset_widths=getattr(settings, 'IMGIX_SRCSET_WIDTHS', None) or
+        get_srcset_widths(
+            getattr(settings, 'IMGIX_SRCSET_MIN_WIDTH', SRCSET_MIN_WIDTH),
+            getattr(settings, 'IMGIX_SRCSET_MAX_WIDTH', SRCSET_MAX_WIDTH),
+            getattr(settings, 'IMGIX_SRCSET_TOLERANCE', SRCSET_TOLERANCE),
+        ),
+        formats=getattr(settings, 'IMGIX_FORMATS', None),
+        cache=get_cache_alias(),
+        cache_timeout=getattr(
+            settings, 'IMGIX_CACHE_TIMEOUT', DEFAULT_TIMEOUT),
+        signer=getattr(settings, 'IMGIX_SIGNER', None),
+        shard_weights=getattr(settings, 'IMGIX_SHARD_WEIGHTS', None),
+        metrics=getattr(settings, 'IMGIX_METRICS', False),
+        metrics_callback=getattr(settings, 'IMGIX_METRICS_CALLBACK', None),
+        normalize=getattr(settings, 'IMGIX_NORMALIZE', False),
+        size_buckets=getattr(settings, 'IMGIX_SIZE_BUCKETS', None),
+        url_engine=getattr(settings, 'IMGIX_URL_ENGINE', 'imgix'),
+        manifest=getattr(settings, 'IMGIX_MANIFEST', None),
+        picture_formats=getattr(settings, 'IMGIX_PICTURE_FORMATS', None)
+    )
+
+
+_aliases = None
+
+
+def get_compiled_aliases(aliases, normalize=False, size_buckets=None):
+    """
+    Return the SizeBuckets of IMGIX_SIZE_BUCKETS (or None) and the aliases
+    compiled with them and IMGIX_NORMALIZE. They are only compiled once for
+    the same settings, so those compiled when the app is ready are the ones
+    the configuration uses.
+    """
+    global _aliases
+    compiled = _aliases
+    if (compiled is not None and compiled[0] is aliases and
+            compiled[1] == normalize and compiled[2] is size_buckets):
+        return compiled[3]
+
+    if normalize not in (None, False, True, 'strict'):
+        raise ImproperlyConfigured(
+            "IMGIX_NORMALIZE must be True, False or 'strict'"
+        )
+    buckets = None
+    if size_buckets:
+        from .buckets import SizeBuckets
+        buckets = SizeBuckets(size_buckets)
+    result = (buckets, compile_aliases(aliases, normalize, buckets))
+    _aliases = (aliases, normalize, size_buckets, result)
+    return result
+
+
+def get_settings_aliases():
+    """
+    Validate and compile IMGIX_ALIASES, as get_config will.
+    """
+    return get_compiled_aliases(
+        getattr(settings, 'IMGIX_ALIASES', None),
+        getattr(settings, 'IMGIX_NORMALIZE', False),
+        getattr(settings, 'IMGIX_SIZE_BUCKETS', None),
+    )[1]
+
+
+_config = None
+
+
+def get_config():
+    """
+    Return the process-wide ImgixConfig, resolving it on first use.
+    """
+    global _config
+    config = _config
+    if config is None:
+        config = _config = ImgixConfig.from_settings()
+    return config
+
+
+def clear_config():
+    global _config, _aliases
+    _config = None
+    _aliases = None
+
+
+@receiver(setting_changed)
+def _imgix_setting_changed(sender, setting, **kwargs):
+    if setting.startswith('IMGIX_'):
+        clear_config()
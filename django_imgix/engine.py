@@ -0,0 +1,111 @@
+"""
+django-imgix's own URL engine, selected with IMGIX_URL_ENGINE = 'native'.
+
+URLEngine builds exactly the URLs imgix.UrlBuilder builds for one domain, but
+does the work that is the same for many URLs only once:
+
+- the ``scheme://domain`` prefix is computed when the engine is created;
+- the encoded query string of a set of parameters (typically those of an
+  alias) is kept, so it is only encoded the first time it is used;
+- ASCII paths, by far the most common, are used as they are, and the
+  percent-encoding of the segments of other paths is kept;
+- the sign key is hashed once (see PrefixSigner);
+
+and the URL is assembled with a single join.
+"""
+try:
+    from urllib import quote
+except ImportError:
+    # Python 3 location
+    from urllib.parse import quote
+
+import imgix
+
+from .aliases import encode_query
+from .signing import PrefixSigner
+
+IXLIB = 'python-' + imgix.__version__
+
+# Entries kept in each of the memos of an engine before it is emptied
+MEMO_SIZE = 2048
+
+# Characters imgix.UrlBuilder doesn't escape in web proxy paths
+WEB_PROXY_SAFE = "~()*!.'"
+
+
+def _is_ascii(value):
+    try:
+        value.encode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+
+class URLEngine(object):
+    """
+    Builds the imgix URLs of one domain, like ``imgix.UrlBuilder(domain,
+    use_https, sign_key).create_url``.
+    """
+
+    def __init__(self, domain, use_https=True, sign_key=None):
+        self.prefix = ('https' if use_https else 'http') + '://' + domain
+        self.signer = PrefixSigner(sign_key) if sign_key else None
+        self._queries = {}
+        self._segments = {}
+
+    def encode_path(self, path):
+        """
+        Return a path as imgix.UrlBuilder puts it in the URL.
+        """
+        if path.startswith('http'):
+            # Web proxy source, escaped as a whole
+            return '/' + quote(path.encode('utf-8'), WEB_PROXY_SAFE)
+        if not path.startswith('/'):
+            path = '/' + path
+        if path.startswith('/http') or _is_ascii(path):
+            return path
+
+        segments = self._segments
+        if len(segments) >= MEMO_SIZE:
+            segments.clear()
+        encoded = []
+        for segment in path.split('/'):
+            value = segments.get(segment)
+            if value is None:
+                value = segments[segment] = quote(segment.encode('utf-8'))
+            encoded.append(value)
+        return '/'.join(encoded)
+
+    def encode_query(self, arguments):
+        """
+        Return the query string, without signature, of a dict of parameters.
+        """
+        try:
+            # With the type of each value: 70 and 70.0, or 0 and False, are
+            # equal keys but not the same query string
+            key = tuple(sorted(
+                (name, value.__class__, value)
+                for name, value in arguments.items()
+            ))
+            query = self._queries.get(key)
+        except TypeError:
+            # Unhashable or unorderable values are encoded every time
+            key = query = None
+
+        if query is None:
+            params = dict(arguments)
+            params['ixlib'] = IXLIB
+            query = encode_query(params.items())
+            if key is not None:
+                if len(self._queries) >= MEMO_SIZE:
+                    self._queries.clear()
+                self._queries[key] = query
+        return query
+
+    def create_url(self, path, arguments):
+        path = self.encode_path(path)
+        query = self.encode_query(arguments)
+        if self.signer is None:
+            return ''.join((self.prefix, path, '?', query))
+        signature = self.signer.sign(path + '?' + query)
+        return ''.join((self.prefix, path, '?', query, '&s=', signature))
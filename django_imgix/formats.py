@@ -0,0 +1,96 @@
+"""
+Detection of the imgix output format (``fm``) from the extension of an image
+URL, used when IMGIX_DETECT_FORMAT is on, and the formats of the sources of
+the imgix_picture tag (IMGIX_PICTURE_FORMATS).
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+FORMATS = {
+    'jpg': 'jpg',
+    'jpeg': 'jpg',
+    'png': 'png',
+    'gif': 'gif',
+    'jp2': 'jp2',
+    'jxr': 'jxr',
+    'webp': 'webp',
+}
+
+# The MIME type of each imgix format a <picture> can have a source for
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jxl': 'image/jxl',
+    'jp2': 'image/jp2',
+    'jxr': 'image/vnd.ms-photo',
+    'png': 'image/png',
+    'png8': 'image/png',
+    'png32': 'image/png',
+    'jpg': 'image/jpeg',
+    'pjpg': 'image/jpeg',
+    'gif': 'image/gif',
+}
+
+PICTURE_FORMATS = ('avif', 'webp')
+
+
+def get_picture_formats(formats=None):
+    """
+    Return the ``(fm, MIME type)`` of each of formats (PICTURE_FORMATS by
+    default), or raise ValueError if one of them is unknown.
+    """
+    if formats is None:
+        formats = PICTURE_FORMATS
+    elif isinstance(formats, str):
+        formats = [fm.strip() for fm in formats.split(',') if fm.strip()]
+    unknown = [fm for fm in formats if fm not in MIME_TYPES]
+    if unknown:
+        raise ValueError(
+            "Unknown picture format(s) {0}, expected some of {1}".format(
+                ', '.join(repr(fm) for fm in unknown),
+                ', '.join(sorted(MIME_TYPES)))
+        )
+    return tuple((fm, MIME_TYPES[fm]) for fm in formats)
+
+
+def get_extension(image_url):
+    """
+    Return the lower-cased extension of the path of an image URL, ignoring
+    its query string and fragment, or '' if the path has no extension.
+    """
+    path = image_url
+    if '?' in path or '#' in path:
+        path = path.partition('#')[0].partition('?')[0]
+    head, dot, extension = path.rpartition('.')
+    if not dot or '/' in extension:
+        # No dot, or the dot is in a directory name rather than the file name
+        return ''
+    return extension.lower()
+
+
+class FormatDetector(object):
+    """
+    Maps the extension of an image URL to an imgix ``fm`` value.
+
+    ``formats`` extends or overrides the default table of extensions; mapping
+    an extension to None disables detection for it.
+    """
+
+    def __init__(self, formats=None):
+        table = dict(FORMATS)
+        if formats:
+            if not isinstance(formats, dict):
+                raise ImproperlyConfigured(
+                    "IMGIX_FORMATS must be a dict of extensions to formats"
+                )
+            table.update(
+                (extension.lower(), fm) for extension, fm in formats.items()
+            )
+        self.formats = dict(
+            (extension, fm) for extension, fm in table.items() if fm
+        )
+
+    def detect(self, image_url):
+        """
+        Return the format for image_url, or None if it isn't recognised.
+        """
+        return self.formats.get(get_extension(image_url))
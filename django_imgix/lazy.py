@@ -0,0 +1,80 @@
+"""
+Lazily built imgix URLs.
+"""
+try:
+    from django.utils.safestring import mark_safe
+except ImportError:
+    mark_safe = lambda s: s
+
+from .api import get_arguments, get_image_arguments
+from .conf import get_config
+
+
+class ImgixURL(object):
+    """
+    The path and final parameters of an imgix URL, which is only built (and
+    signed) the first time it is converted to a string.
+
+    Instances are immutable; ``with_params`` returns a new URL with some of
+    the parameters changed.
+    """
+    __slots__ = ('path', 'params', '_url')
+
+    def __init__(self, path, params):
+        self.path = path
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        self.params = params
+        self._url = None
+
+    def __str__(self):
+        url = self._url
+        if url is None:
+            url = self._url = mark_safe(get_config().create_url(
+                self.path, dict(self.params)))
+        return url
+
+    # Output unescaped, like the URLs of the get_imgix tag
+    __html__ = __str__
+
+    def __repr__(self):
+        return '<ImgixURL {0} {1!r}>'.format(self.path, dict(self.params))
+
+    def __eq__(self, other):
+        if not isinstance(other, ImgixURL):
+            return NotImplemented
+        return self.path == other.path and self.params == other.params
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((self.path, self.params))
+
+    def with_params(self, **params):
+        """
+        Return a new URL for the same image with the given parameters added
+        or replaced; a parameter set to None is removed.
+        """
+        merged = dict(self.params)
+        merged.update(params)
+        return ImgixURL(
+            self.path,
+            dict((key, value) for key, value in merged.items()
+                 if value is not None)
+        )
+
+
+def imgix_url(image_url, alias=None, wh=None, **kwargs):
+    """
+    Return an ImgixURL for an image, taking the same arguments as the
+    ``get_imgix`` template tag.
+
+    The alias and arguments are resolved (and any error raised) immediately;
+    only building the URL is deferred.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    return ImgixURL(path, arguments)
@@ -0,0 +1,67 @@
+"""
+Build the URLs of a declared set of images into the IMGIX_MANIFEST file, like
+collectstatic does for ManifestStaticFilesStorage. Run it on deploy, whenever
+the images or the IMGIX_* settings change.
+
+    manage.py imgix_manifest                          # IMGIX_MANIFEST_IMAGES
+    manage.py imgix_manifest --paths cms.txt --alias thumb --alias large
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from ...conf import get_config
+from ...manifest import get_manifest_items, write_manifest
+
+
+class Command(BaseCommand):
+    help = "Writes the imgix URLs of IMGIX_MANIFEST_IMAGES (and of a file " \
+           "of paths) to the IMGIX_MANIFEST file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paths', metavar='FILE',
+            help='Also include the image URLs listed in this file, one per '
+                 'line.')
+        parser.add_argument(
+            '--alias', action='append', dest='aliases', default=[],
+            help='An alias to build the URLs of --paths with (default: no '
+                 'alias). Can be given several times.')
+        parser.add_argument(
+            '--output', metavar='FILE',
+            help='Write the manifest to this file instead of IMGIX_MANIFEST.')
+
+    def handle(self, *args, **options):
+        filename = options['output'] or getattr(
+            settings, 'IMGIX_MANIFEST', None)
+        if not filename:
+            raise CommandError("IMGIX_MANIFEST must be set, or --output given")
+
+        config = get_config()
+        if not config.is_deterministic():
+            raise CommandError(
+                "A manifest can't be used with IMGIX_SHARD_STRATEGY 'cycle'")
+
+        images = list(getattr(settings, 'IMGIX_MANIFEST_IMAGES', None) or ())
+        if options['paths']:
+            aliases = options['aliases'] or [None]
+            with open(options['paths']) as lines:
+                for line in lines:
+                    line = line.strip()
+                    if line:
+                        images.extend((line, alias) for alias in aliases)
+        elif options['aliases']:
+            raise CommandError("--alias requires --paths")
+
+        try:
+            items = get_manifest_items(config, images)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        except (TypeError, ValueError) as e:
+            raise CommandError(
+                "IMGIX_MANIFEST_IMAGES must be a list of image URLs or of "
+                "(image URL, alias) pairs ({0})".format(e))
+
+        count = write_manifest(filename, config, items)
+        if options['verbosity'] >= 1:
+            self.stdout.write("{0} URLs written to {1}".format(count, filename))
@@ -0,0 +1,222 @@
+"""
+Fill the IMGIX_CACHE with the URLs of the images held by models, or listed in
+a file, so that pages don't have to build them after a deploy.
+
+    manage.py imgix_warm                                # every imgix field
+    manage.py imgix_warm shop.Product.image --alias thumb --processes 4
+    manage.py imgix_warm --paths images.txt --alias thumb --rate 2000
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import FileField
+try:
+    from django.core.exceptions import FieldDoesNotExist
+except ImportError:
+    # Django < 1.8 location
+    from django.db.models.fields import FieldDoesNotExist
+
+from ...api import _chunks, _iter_items, get_arguments
+from ...conf import get_config
+from ...models import ImgixFieldMixin
+from ...parallel import _build_items, _init_worker, get_worker_options
+
+
+class Command(BaseCommand):
+    help = "Stores the imgix URLs of the images of models (or of a file of " \
+           "paths) in IMGIX_CACHE."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fields', nargs='*', metavar='app_label.Model[.field]',
+            help='The imgix fields to warm (default: all of them).')
+        parser.add_argument(
+            '--paths', metavar='FILE',
+            help='Warm the image URLs listed in this file, one per line, '
+                 'instead of those of the models.')
+        parser.add_argument(
+            '--alias', action='append', dest='aliases', default=[],
+            help='An alias to warm (default: the imgix_aliases of each '
+                 'field). Can be given several times.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Images read and URLs stored at a time (default: 500).')
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Build the URLs in this many processes (default: 1).')
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='At most this many URLs per second (default: no limit).')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the URLs that would be warmed.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.chunk_size = options['chunk_size']
+        self.rate = options['rate']
+        self.dry_run = options['dry_run']
+
+        config = get_config()
+        if config.shared_cache is None and not self.dry_run:
+            raise CommandError(
+                "IMGIX_CACHE must be set (and IMGIX_SHARD_STRATEGY must not "
+                "be 'cycle') to warm the URL cache")
+        if self.chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        if options['paths']:
+            if not options['aliases']:
+                raise CommandError("--paths requires at least one --alias")
+            sources = [(options['paths'], self.read_paths(options['paths']),
+                        options['aliases'])]
+        else:
+            sources = self.get_field_sources(options['fields'],
+                                             options['aliases'])
+
+        self.processes = options['processes']
+        self.pool = None
+        if self.processes > 1 and not self.dry_run:
+            self.pool = ProcessPoolExecutor(
+                self.processes, initializer=_init_worker,
+                initargs=(get_worker_options(),))
+        self.started = time.time()
+        self.total = 0
+        try:
+            for label, paths, aliases in sources:
+                self.warm(config, label, paths, aliases)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+    def read_paths(self, filename):
+        with open(filename) as lines:
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield line
+
+    def get_field_sources(self, labels, aliases):
+        """
+        Return ``(label, paths, aliases)`` for each field to warm.
+        """
+        fields = []
+        if not labels:
+            for model in apps.get_models():
+                fields.extend(
+                    (model, field) for field in model._meta.concrete_fields
+                    if isinstance(field, ImgixFieldMixin)
+                )
+        for label in labels:
+            parts = label.split('.')
+            if len(parts) not in (2, 3):
+                raise CommandError(
+                    "{0} is not of the form app_label.Model[.field]".format(
+                        label))
+            try:
+                model = apps.get_model(parts[0], parts[1])
+            except LookupError:
+                raise CommandError("Unknown model {0}".format(label))
+            if len(parts) == 3:
+                try:
+                    field = model._meta.get_field(parts[2])
+                except FieldDoesNotExist:
+                    raise CommandError("Unknown field {0}".format(label))
+                if not isinstance(field, FileField):
+                    raise CommandError(
+                        "{0} is not a file or image field".format(label))
+                fields.append((model, field))
+            else:
+                fields.extend(
+                    (model, field) for field in model._meta.concrete_fields
+                    if isinstance(field, ImgixFieldMixin)
+                )
+
+        sources = []
+        for model, field in fields:
+            label = '{0}.{1}'.format(model._meta.label, field.name)
+            field_aliases = aliases or getattr(field, 'imgix_aliases', ())
+            if not field_aliases:
+                if self.verbosity >= 2:
+                    self.stdout.write("Skipping {0}: no aliases".format(label))
+                continue
+            sources.append((label, self.iter_field_paths(model, field),
+                            field_aliases))
+        return sources
+
+    def iter_field_paths(self, model, field):
+        names = (
+            model._default_manager.exclude(**{field.attname: ''})
+            .exclude(**{field.attname + '__isnull': True})
+            .values_list(field.attname, flat=True)
+        )
+        if django.VERSION >= (2, 0):
+            names = names.iterator(chunk_size=self.chunk_size)
+        else:
+            names = names.iterator()
+        url = field.storage.url
+        for name in names:
+            yield url(name)
+
+    def warm(self, config, label, paths, aliases):
+        arguments = [get_arguments(config, alias) for alias in aliases]
+        warmed = built = 0
+
+        for chunk in _chunks(paths, self.chunk_size):
+            items = []
+            for alias_arguments in arguments:
+                items.extend(_iter_items(config, chunk, alias_arguments))
+
+            if not self.dry_run:
+                built += self.store(config, items)
+            warmed += len(items)
+            self.total += len(items)
+            if self.verbosity >= 2:
+                self.stdout.write("{0}: {1} URLs".format(label, warmed))
+            self.throttle()
+
+        if self.verbosity >= 1:
+            if self.dry_run:
+                message = "{0}: {1} URLs would be warmed".format(label, warmed)
+            else:
+                message = "{0}: {1} URLs warmed, {2} built".format(
+                    label, warmed, built)
+            self.stdout.write(message)
+
+    def store(self, config, items):
+        """
+        Store the URLs of items that aren't in the cache yet, returning how
+        many were built.
+        """
+        shared_cache = config.shared_cache
+        missing = {}
+        for path, arguments in items:
+            missing[shared_cache.make_key(path, arguments)] = (path, arguments)
+        for key in shared_cache.get_many(list(missing)):
+            del missing[key]
+        if not missing:
+            return 0
+
+        keys = list(missing)
+        items = [missing[key] for key in keys]
+        if self.pool is None:
+            build_url = config.build_url
+            urls = [build_url(path, arguments) for path, arguments in items]
+        else:
+            size = -(-len(items) // self.processes)
+            urls = []
+            for chunk_urls in self.pool.map(_build_items,
+                                            _chunks(items, size)):
+                urls.extend(chunk_urls)
+        shared_cache.set_many(dict(zip(keys, urls)))
+        return len(keys)
+
+    def throttle(self):
+        if self.rate <= 0 or self.dry_run:
+            return
+        delay = self.total / self.rate - (time.time() - self.started)
+        if delay > 0:
+            time.sleep(delay)
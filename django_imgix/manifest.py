@@ -0,0 +1,114 @@
+"""
+A file of prebuilt URLs, for IMGIX_MANIFEST.
+
+``manage.py imgix_manifest`` builds the URLs of a declared set of images
+(IMGIX_MANIFEST_IMAGES, and/or a file of paths) and writes them, together with
+the fingerprint of the settings they were built with, to the IMGIX_MANIFEST
+file. The file is read the first time a URL is needed and the URLs it holds
+are then returned without being built; a manifest built with other settings
+is ignored with a StaleManifestWarning, so it can never serve wrong URLs.
+"""
+import json
+import warnings
+
+# Changed whenever the format of the file changes
+VERSION = 1
+
+
+class StaleManifestWarning(UserWarning):
+    """
+    Issued when the IMGIX_MANIFEST file can't be used.
+    """
+
+
+def get_manifest_items(config, images):
+    """
+    Return the ``(path, arguments)`` pair of each ``(image_url, alias)`` (or
+    plain image URL) of images.
+    """
+    from .api import get_arguments, get_image_arguments
+
+    arguments = {}
+    items = []
+    for image in images:
+        if isinstance(image, (list, tuple)):
+            image_url, alias = image
+        else:
+            image_url, alias = image, None
+        if alias not in arguments:
+            arguments[alias] = get_arguments(config, alias)
+        items.append(get_image_arguments(config, image_url, arguments[alias]))
+    return items
+
+
+def write_manifest(filename, config, items):
+    """
+    Build the URL of each ``(path, arguments)`` pair of items and write them
+    to a manifest file. Return the number of URLs written.
+    """
+    urls = []
+    seen = set()
+    for path, arguments in items:
+        key = (path, json.dumps(arguments, sort_keys=True))
+        if key in seen:
+            continue
+        seen.add(key)
+        urls.append([path, arguments, config.build_url(path, arguments)])
+
+    with open(filename, 'w') as output:
+        json.dump({
+            'version': VERSION,
+            'fingerprint': config.fingerprint,
+            'urls': urls,
+        }, output, separators=(',', ':'), sort_keys=True)
+    return len(urls)
+
+
+class URLManifest(object):
+    """
+    The URLs of a manifest file, loaded on first use.
+    """
+
+    def __init__(self, filename, fingerprint):
+        self.filename = filename
+        self.fingerprint = fingerprint
+        self._urls = None
+
+    def get(self, key):
+        """
+        Return the URL for a URL cache key (see get_url_cache_key), or None.
+        """
+        urls = self._urls
+        if urls is None:
+            urls = self._urls = self.load()
+        return urls.get(key)
+
+    def load(self):
+        from .conf import get_url_cache_key
+
+        try:
+            with open(self.filename) as manifest:
+                data = json.load(manifest)
+        except (IOError, OSError, ValueError) as e:
+            return self.reject("can't be read ({0})".format(e))
+        if not isinstance(data, dict) or data.get('version') != VERSION:
+            return self.reject("isn't a manifest of this version of "
+                               "django-imgix")
+        if data.get('fingerprint') != self.fingerprint:
+            return self.reject("was built with other settings")
+
+        urls = {}
+        for path, arguments, url in data['urls']:
+            key = get_url_cache_key(path, arguments)
+            if key is not None:
+                urls[key] = url
+        return urls
+
+    def reject(self, reason):
+        warnings.warn(
+            "IMGIX_MANIFEST {0} {1}, run manage.py imgix_manifest to build it "
+            "again; URLs are built as if it wasn't set".format(
+                self.filename, reason),
+            StaleManifestWarning
+        )
+        return {}
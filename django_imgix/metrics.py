@@ -0,0 +1,197 @@
+"""
+Per-request metrics of the imgix URLs built.
+
+With IMGIX_METRICS = True, the URL building methods of the configuration are
+wrapped to record into the current ImgixMetrics, which ImgixMetricsMiddleware
+starts and stops around each request. When the setting is off nothing is
+wrapped, so there is no cost at all.
+
+The current metrics are held in a context variable, so they follow a request
+into the threads and event loop of sync_to_async and async_to_sync (they are
+per thread on Python < 3.7).
+"""
+import threading
+from timeit import default_timer
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    # Python < 3.7
+    ContextVar = None
+
+
+class _ThreadMetrics(threading.local):
+    """
+    The ContextVar API over the metrics of the current thread.
+    """
+    metrics = None
+
+    def get(self):
+        return self.metrics
+
+    def set(self, metrics):
+        self.metrics = metrics
+
+
+if ContextVar is not None:
+    _current = ContextVar('imgix_metrics', default=None)
+else:
+    _current = _ThreadMetrics()
+
+
+class ImgixMetrics(object):
+    """
+    What the imgix URLs of one request cost; times are in seconds.
+
+    ``urls`` counts the URLs asked for and ``built`` those that weren't found
+    in the URL caches. ``sign_time`` is only measured with IMGIX_SIGNER, as
+    imgix.UrlBuilder signs URLs while building them otherwise.
+    """
+
+    def __init__(self):
+        self.urls = 0
+        self.built = 0
+        self.time = 0.0
+        self.build_time = 0.0
+        self.sign_time = 0.0
+        self.depth = 0
+
+    @property
+    def cache_hits(self):
+        return max(self.urls - self.built, 0)
+
+    @property
+    def cache_hit_ratio(self):
+        if not self.urls:
+            return None
+        return float(self.cache_hits) / self.urls
+
+    def as_dict(self):
+        return {
+            'urls': self.urls,
+            'built': self.built,
+            'cache_hits': self.cache_hits,
+            'cache_hit_ratio': self.cache_hit_ratio,
+            'time': self.time,
+            'build_time': self.build_time,
+            'sign_time': self.sign_time,
+        }
+
+    def server_timing(self):
+        """
+        Return the metrics as the value of a Server-Timing header.
+        """
+        entries = [
+            'imgix;dur={0:.3f};desc="{1} URLs"'.format(
+                self.time * 1000, self.urls),
+            'imgix-build;dur={0:.3f};desc="{1} built"'.format(
+                self.build_time * 1000, self.built),
+        ]
+        if self.sign_time:
+            entries.append(
+                'imgix-sign;dur={0:.3f}'.format(self.sign_time * 1000))
+        if self.urls:
+            entries.append(
+                'imgix-cache;desc="{0:.0%} hits"'.format(self.cache_hit_ratio))
+        return ', '.join(entries)
+
+
+def start():
+    """
+    Start recording the metrics of the current request and return them.
+    """
+    metrics = ImgixMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def stop():
+    """
+    Stop recording and return the metrics of the current request, or None if
+    they weren't being recorded.
+    """
+    metrics = _current.get()
+    _current.set(None)
+    return metrics
+
+
+def get_current():
+    return _current.get()
+
+
+def record_hit():
+    """
+    Record a URL that was returned without asking the configuration for it
+    (a folded get_imgix tag), as a cache hit.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.urls += 1
+
+
+def instrument(config):
+    """
+    Wrap the URL building methods of an ImgixConfig (and its signer) to record
+    into the current metrics.
+    """
+    build_url = config.build_url
+    create_url = config.create_url
+    create_urls = config.create_urls
+
+    def timed_build_url(path, arguments):
+        metrics = _current.get()
+        if metrics is None:
+            return build_url(path, arguments)
+        started = default_timer()
+        try:
+            return build_url(path, arguments)
+        finally:
+            metrics.built += 1
+            metrics.build_time += default_timer() - started
+
+    def timed_create_url(path, arguments):
+        metrics = _current.get()
+        # Only the outermost call is timed (create_urls calls create_url)
+        if metrics is None or metrics.depth:
+            return create_url(path, arguments)
+        metrics.depth += 1
+        started = default_timer()
+        try:
+            return create_url(path, arguments)
+        finally:
+            metrics.depth -= 1
+            metrics.urls += 1
+            metrics.time += default_timer() - started
+
+    def timed_create_urls(items):
+        metrics = _current.get()
+        if metrics is None or metrics.depth:
+            return create_urls(items)
+        metrics.depth += 1
+        started = default_timer()
+        try:
+            return create_urls(items)
+        finally:
+            metrics.depth -= 1
+            metrics.urls += len(items)
+            metrics.time += default_timer() - started
+
+    config.build_url = timed_build_url
+    config.create_url = timed_create_url
+    config.create_urls = timed_create_urls
+
+    signer = config.signer
+    if signer is not None:
+        sign_url = signer.sign_url
+
+        def timed_sign_url(url):
+            metrics = _current.get()
+            if metrics is None:
+                return sign_url(url)
+            started = default_timer()
+            try:
+                return sign_url(url)
+            finally:
+                metrics.sign_time += default_timer() - started
+
+        signer.sign_url = timed_sign_url
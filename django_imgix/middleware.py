@@ -0,0 +1,43 @@
+"""
+Middleware reporting the imgix metrics of each request.
+"""
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:
+    # Django < 1.10
+    MiddlewareMixin = object
+
+from . import metrics
+from .conf import get_config
+
+
+class ImgixMetricsMiddleware(MiddlewareMixin):
+    """
+    Records the imgix URLs built while handling each request (IMGIX_METRICS
+    must be True) and adds them to the response as Server-Timing entries.
+
+    The ImgixMetrics of the request are also passed to the
+    IMGIX_METRICS_CALLBACK function, if set, as ``callback(request, metrics)``.
+    """
+
+    def process_request(self, request):
+        if not get_config().metrics:
+            metrics.stop()
+        elif metrics.get_current() is None:
+            # Unless ImgixPanel, before this middleware, started them
+            metrics.start()
+
+    def process_response(self, request, response):
+        current = metrics.stop()
+        if current is None:
+            return response
+
+        timing = current.server_timing()
+        if response.has_header('Server-Timing'):
+            timing = response['Server-Timing'] + ', ' + timing
+        response['Server-Timing'] = timing
+
+        callback = get_config().metrics_callback
+        if callback is not None:
+            callback(request, current)
+        return response
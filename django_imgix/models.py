@@ -0,0 +1,178 @@
+"""
+Model fields giving access to the imgix URLs of the files they hold.
+
+    class Product(models.Model):
+        image = ImgixImageField(
+            upload_to='products',
+            imgix_aliases=['thumb', 'hero'],
+            imgix_urls_field='image_imgix_urls',
+        )
+        image_imgix_urls = models.TextField(blank=True, editable=False)
+
+``product.image.imgix_urls`` is a dict of the URL for each alias, built the
+first time it is accessed and kept on the instance. With ``imgix_urls_field``
+the URLs are also stored (as JSON) in that field whenever the instance is
+saved, and read back from it instead of being built again, as long as the file
+and the imgix settings haven't changed since (see get_imgix_fingerprint).
+"""
+import hashlib
+import json
+
+from django.db import models
+from django.db.models.fields.files import FieldFile, ImageFieldFile
+
+from .api import build_imgix_url
+from .conf import get_config
+
+
+class ImgixFieldFileMixin(object):
+    """
+    Adds imgix URLs to a FieldFile.
+    """
+
+    @property
+    def imgix_urls(self):
+        """
+        A dict of the URL for each of the field's ``imgix_aliases``.
+        """
+        if not self:
+            return {}
+        fingerprint = self.field.get_imgix_fingerprint()
+        cached = getattr(self, '_imgix_urls', None)
+        if cached is None or cached[:2] != (self.name, fingerprint):
+            urls = self.field.get_stored_imgix_urls(self.instance, self.name,
+                                                    fingerprint)
+            if urls is None:
+                urls = self.build_imgix_urls()
+            cached = self._imgix_urls = (self.name, fingerprint, urls)
+        return cached[2]
+
+    def build_imgix_urls(self):
+        url = self.url
+        return dict(
+            (alias, build_imgix_url(url, alias))
+            for alias in self.field.imgix_aliases
+        )
+
+    def imgix(self, alias=None, wh=None, **kwargs):
+        """
+        Return the URL of the file for an alias or inline arguments, like the
+        ``get_imgix`` template tag.
+        """
+        if alias in self.field.imgix_aliases and not wh and not kwargs:
+            return self.imgix_urls[alias]
+        return build_imgix_url(self.url, alias, wh, **kwargs)
+
+
+class ImgixFieldFile(ImgixFieldFileMixin, FieldFile):
+    pass
+
+
+class ImgixImageFieldFile(ImgixFieldFileMixin, ImageFieldFile):
+    pass
+
+
+class ImgixFieldMixin(object):
+    """
+    Adds the ``imgix_aliases`` and ``imgix_urls_field`` options to a
+    FileField (sub)class, whose ``attr_class`` must use ImgixFieldFileMixin.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.imgix_aliases = tuple(kwargs.pop('imgix_aliases', ()))
+        self.imgix_urls_field = kwargs.pop('imgix_urls_field', None)
+        self._imgix_fingerprint = None
+        super(ImgixFieldMixin, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(ImgixFieldMixin, self).deconstruct()
+        if self.imgix_aliases:
+            kwargs['imgix_aliases'] = list(self.imgix_aliases)
+        if self.imgix_urls_field:
+            kwargs['imgix_urls_field'] = self.imgix_urls_field
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super(ImgixFieldMixin, self).contribute_to_class(cls, name, **kwargs)
+        # pre_save is sent before any field value is collected, so the stored
+        # URLs are up to date whatever the order of the fields
+        if self.imgix_urls_field and not cls._meta.abstract:
+            models.signals.pre_save.connect(
+                self.update_imgix_urls, sender=cls, weak=False)
+
+    def get_imgix_fingerprint(self):
+        """
+        Return a short hash of everything the URLs of the field's aliases
+        depend on, other than the file: the settings fingerprint of the
+        configuration, the compiled parameters of these aliases and the format
+        detection, web proxy, normalization and size bucket settings.
+        """
+        config = get_config()
+        cached = self._imgix_fingerprint
+        if cached is not None and cached[0] is config:
+            return cached[1]
+
+        aliases = config.aliases or {}
+        size_buckets = config.size_buckets
+        parts = [
+            config.fingerprint,
+            repr([(alias, aliases[alias].params if alias in aliases else None)
+                  for alias in self.imgix_aliases]),
+            repr(config.format_detect),
+            repr(sorted(config.format_detector.formats.items())),
+            repr(config.web_proxy),
+            repr(config.normalize),
+            repr(sorted(size_buckets.ladders.items()) if size_buckets else None),
+        ]
+        value = '\x00'.join(parts).encode('utf-8')
+        fingerprint = hashlib.md5(value).hexdigest()[:12]
+        self._imgix_fingerprint = (config, fingerprint)
+        return fingerprint
+
+    def get_stored_imgix_urls(self, instance, name, fingerprint):
+        """
+        Return the URLs stored on instance for a file name and settings
+        fingerprint, or None if there are none or they are stale.
+        """
+        if not self.imgix_urls_field:
+            return None
+        stored = getattr(instance, self.imgix_urls_field, None)
+        if not stored:
+            return None
+        if not isinstance(stored, dict):
+            try:
+                stored = json.loads(stored)
+            except ValueError:
+                return None
+        if (stored.get('name') != name or
+                stored.get('fingerprint') != fingerprint):
+            return None
+        return stored.get('urls')
+
+    def update_imgix_urls(self, instance, raw=False, **kwargs):
+        if raw:
+            return
+        file = getattr(instance, self.attname)
+        if file:
+            stored = {
+                'name': file.name,
+                'fingerprint': self.get_imgix_fingerprint(),
+                'urls': file.build_imgix_urls(),
+            }
+            file._imgix_urls = (
+                stored['name'], stored['fingerprint'], stored['urls'])
+        else:
+            stored = None
+
+        target = instance._meta.get_field(self.imgix_urls_field)
+        if target.get_internal_type() != 'JSONField':
+            stored = json.dumps(stored, sort_keys=True) if stored else ''
+        setattr(instance, self.imgix_urls_field, stored)
+
+
+class ImgixFileField(ImgixFieldMixin, models.FileField):
+    attr_class = ImgixFieldFile
+
+
+class ImgixImageField(ImgixFieldMixin, models.ImageField):
+    attr_class = ImgixImageFieldFile
@@ -0,0 +1,124 @@
+"""
+Canonical forms of imgix parameters, for IMGIX_NORMALIZE.
+
+The same image requested with ``w=250`` and ``w='250'``, or ``auto='format,
+compress'`` and ``auto='compress,format'``, gets two different URLs, and so
+two CDN cache entries and two renders. Normalized parameters have:
+
+- numbers instead of numeric strings, and integers instead of integral
+  floats, for numeric parameters (``q=70.0`` is ``q=70``);
+- the items of unordered comma-separated lists (``auto``, ``ch``) sorted and
+  deduplicated;
+- no parameters set to the value imgix uses by default (``dpr=1``, ``q=75``,
+  ``fit='clip'``...), or to an empty string when that is the same as not
+  setting them.
+
+``q=75`` is kept when ``auto`` contains ``compress``, as imgix then uses a
+lower quality unless ``q`` is set.
+"""
+import warnings
+
+try:
+    string_types = (basestring,)
+except NameError:
+    string_types = (str,)
+
+NUMBER_PARAMS = frozenset([
+    'w', 'h', 'dpr', 'q', 'blur', 'sharp', 'rot', 'bri', 'con', 'exp',
+    'gam', 'high', 'hue', 'sat', 'shad', 'vib', 'usm', 'usmrad', 'px', 'pad',
+    'nr', 'nrs', 'min-w', 'min-h', 'max-w', 'max-h', 'fp-x', 'fp-y', 'fp-z',
+    'colors',
+])
+
+LIST_PARAMS = frozenset(['auto', 'ch'])
+
+DEFAULTS = {
+    'dpr': 1,
+    'q': 75,
+    'fit': 'clip',
+    'rot': 0,
+    'blur': 0,
+    'sharp': 0,
+    'bri': 0,
+    'con': 0,
+    'exp': 0,
+    'gam': 0,
+    'high': 0,
+    'hue': 0,
+    'sat': 0,
+    'shad': 0,
+    'vib': 0,
+    'px': 0,
+}
+
+# Parameters for which an empty string is the same as no value
+EMPTY_DEFAULTS = LIST_PARAMS | frozenset(DEFAULTS)
+
+
+class NonCanonicalParameterWarning(UserWarning):
+    """
+    Issued for each parameter changed by the normalization when
+    IMGIX_NORMALIZE is 'strict'.
+    """
+
+
+def normalize_value(key, value):
+    """
+    Return the canonical form of the value of a parameter.
+    """
+    if key in LIST_PARAMS and isinstance(value, string_types):
+        items = set(item.strip() for item in value.split(','))
+        items.discard('')
+        return ','.join(sorted(items))
+    if key in NUMBER_PARAMS and not isinstance(value, bool):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return value
+        if number.is_integer():
+            return int(number)
+        return number
+    return value
+
+
+def is_default(key, value, compress=False):
+    """
+    Return whether a canonical value can be omitted; compress tells whether
+    ``auto`` contains ``compress``.
+    """
+    if value == '':
+        return key in EMPTY_DEFAULTS
+    if key == 'q' and compress:
+        return False
+    return key in DEFAULTS and value == DEFAULTS[key]
+
+
+def normalize_params(params, strict=False, source='get_imgix'):
+    """
+    Return a new dict of the canonical form of params. In strict mode, a
+    NonCanonicalParameterWarning naming source is issued for each parameter
+    that isn't canonical.
+    """
+    auto = normalize_value('auto', params.get('auto'))
+    compress = isinstance(auto, string_types) and \
+        'compress' in auto.split(',')
+
+    normalized = {}
+    for key, value in params.items():
+        canonical = normalize_value(key, value)
+        default = is_default(key, canonical, compress)
+
+        if strict and (default or canonical != value or
+                       type(canonical) is not type(value)):
+            if default:
+                message = "{0}: {1}={2!r} is the default and can be " \
+                          "omitted".format(source, key, value)
+            else:
+                message = "{0}: {1}={2!r} is not canonical, use " \
+                          "{1}={3!r}".format(source, key, value, canonical)
+            warnings.warn(message, NonCanonicalParameterWarning,
+                          stacklevel=3)
+
+        if not default:
+            normalized[key] = canonical
+    return normalized
@@ -0,0 +1,64 @@
+"""
+A django-debug-toolbar panel showing the imgix metrics of a request.
+
+    DEBUG_TOOLBAR_PANELS = [
+        ...
+        'django_imgix.panels.ImgixPanel',
+    ]
+
+IMGIX_METRICS must be True for the panel to have anything to show.
+"""
+from debug_toolbar.panels import Panel
+from django.utils.html import format_html, format_html_join
+
+from . import metrics
+from .conf import get_config
+
+
+class ImgixPanel(Panel):
+
+    title = 'imgix'
+
+    @property
+    def nav_subtitle(self):
+        stats = self.get_stats()
+        if not stats:
+            return ''
+        return '{0} URLs in {1:.2f}ms'.format(
+            stats['urls'], stats['time'] * 1000)
+
+    def process_request(self, request):
+        # Share the metrics of ImgixMetricsMiddleware if it is installed too
+        owner = metrics.get_current() is None and get_config().metrics
+        if owner:
+            metrics.start()
+        current = metrics.get_current()
+        try:
+            return super(ImgixPanel, self).process_request(request)
+        finally:
+            if current is not None:
+                self.record_stats(current.as_dict())
+            if owner:
+                metrics.stop()
+
+    @property
+    def content(self):
+        stats = self.get_stats()
+        if not stats:
+            return format_html('<p>{0}</p>', 'IMGIX_METRICS is not enabled.')
+
+        ratio = stats['cache_hit_ratio']
+        rows = [
+            ('URLs', stats['urls']),
+            ('Built', stats['built']),
+            ('Cache hits', stats['cache_hits']),
+            ('Cache hit ratio',
+             '-' if ratio is None else '{0:.0%}'.format(ratio)),
+            ('Total time', '{0:.3f} ms'.format(stats['time'] * 1000)),
+            ('Build time', '{0:.3f} ms'.format(stats['build_time'] * 1000)),
+            ('Signing time', '{0:.3f} ms'.format(stats['sign_time'] * 1000)),
+        ]
+        return format_html(
+            '<table><tbody>{0}</tbody></table>',
+            format_html_join('', '<tr><th>{0}</th><td>{1}</td></tr>', rows)
+        )
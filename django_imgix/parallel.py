@@ -0,0 +1,90 @@
+"""
+Building the imgix URLs of very many images (e.g. for product feeds or
+sitemaps) in several processes.
+
+    from django_imgix.parallel import iter_imgix_urls_parallel
+
+    for url in iter_imgix_urls_parallel(paths, 'thumb', processes=8):
+        feed.write(url)
+
+The paths are split into chunks that are built by a pool of processes, each
+with its own copy of the configuration resolved from the settings of the
+calling process. URLs are yielded in the order of the paths, and only a few
+chunks per process are in flight at a time, so memory stays bounded however
+long the iterable is.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .api import _chunks, _iter_items, get_arguments
+from .conf import ImgixConfig, get_config, get_config_options
+
+# Chunks submitted to the pool per process before waiting for the first one
+CHUNKS_PER_PROCESS = 2
+
+_worker_config = None
+
+
+def _init_worker(options):
+    global _worker_config
+    _worker_config = ImgixConfig(**options)
+
+
+def get_worker_options():
+    """
+    Return the arguments of the ImgixConfig of the worker processes: those of
+    the current settings, without URL caches or metrics.
+    """
+    options = dict(get_config_options(), url_cache_size=0, cache=None,
+                   metrics=False, metrics_callback=None)
+    options.pop('cache_timeout')
+    return options
+
+
+def _build_items(items):
+    build_url = _worker_config.build_url
+    return [build_url(path, arguments) for path, arguments in items]
+
+
+def _build_chunk(paths, arguments):
+    config = _worker_config
+    build_url = config.build_url
+    return [build_url(path, image_arguments)
+            for path, image_arguments in _iter_items(config, paths, arguments)]
+
+
+def iter_imgix_urls_parallel(paths, alias=None, wh=None, processes=None,
+                             chunk_size=1000, **kwargs):
+    """
+    Return a generator of the imgix URLs for an iterable of images, like
+    iter_imgix_urls, built by ``processes`` processes (the number of CPUs by
+    default) ``chunk_size`` images at a time.
+
+    The URL caches are neither read nor written.
+    """
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    return _iter_parallel(paths, arguments, get_worker_options(), processes,
+                          chunk_size)
+
+
+def _iter_parallel(paths, arguments, options, processes, chunk_size):
+    processes = processes or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(processes, initializer=_init_worker,
+                                   initargs=(options,))
+    max_pending = processes * CHUNKS_PER_PROCESS
+    pending = deque()
+    try:
+        for chunk in _chunks(paths, chunk_size):
+            pending.append(executor.submit(_build_chunk, chunk, arguments))
+            if len(pending) >= max_pending:
+                for url in pending.popleft().result():
+                    yield url
+        while pending:
+            for url in pending.popleft().result():
+                yield url
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
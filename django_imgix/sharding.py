@@ -0,0 +1,82 @@
+"""
+Selection of the domain (shard) of an image when IMGIX_DOMAINS is a list.
+"""
+import itertools
+import zlib
+try:
+    from math import gcd
+except ImportError:
+    # Python 2 location
+    from fractions import gcd
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class ShardSelector(object):
+    """
+    Picks the domain of a path from a CRC32 of the path, the same checksum
+    imgix.UrlBuilder uses for its 'crc' strategy, so an image always gets
+    the same domain across processes and restarts.
+
+    ``weights`` optionally maps domains to their relative share of the paths
+    (1 for domains that aren't in it).
+    """
+    deterministic = True
+
+    def __init__(self, domains, weights=None):
+        self.domains = tuple(domains)
+
+        if weights:
+            if not isinstance(weights, dict):
+                raise ImproperlyConfigured(
+                    "IMGIX_SHARD_WEIGHTS must be a dict of domains to weights"
+                )
+            counts = [weights.get(domain, 1) for domain in self.domains]
+            if not all(isinstance(count, int) and count > 0
+                       for count in counts):
+                raise ImproperlyConfigured(
+                    "IMGIX_SHARD_WEIGHTS must be positive integers"
+                )
+            divisor = 0
+            for count in counts:
+                divisor = gcd(divisor, count)
+            indexes = tuple(
+                index
+                for index, count in enumerate(counts)
+                for _ in range(count // divisor)
+            )
+        else:
+            indexes = tuple(range(len(self.domains)))
+
+        # Each slot of the table is a share of the CRC space
+        self._indexes = indexes
+        self._slots = len(indexes)
+
+    def index(self, path):
+        """
+        Return the index in ``domains`` of the domain for path.
+        """
+        crc = zlib.crc32(path.encode('utf-8')) & 0xffffffff
+        return self._indexes[crc % self._slots]
+
+    def select(self, path):
+        return self.domains[self.index(path)]
+
+
+class CycleSelector(object):
+    """
+    Hands out the domains in turn, for the 'cycle' strategy. The position is
+    shared by every call in the process, but a path doesn't always get the
+    same domain.
+    """
+    deterministic = False
+
+    def __init__(self, domains):
+        self.domains = tuple(domains)
+        self._indexes = itertools.cycle(range(len(self.domains)))
+
+    def index(self, path):
+        return next(self._indexes)
+
+    def select(self, path):
+        return self.domains[self.index(path)]
@@ -0,0 +1,190 @@
+"""
+Image sitemaps with imgix URLs, written as a stream.
+
+    class ProductSitemap(ImgixImageSitemap):
+        imgix_alias = 'large'
+
+        def items(self):
+            return Product.objects.order_by('pk')
+
+        def images(self, product):
+            return [product.image.url]
+
+    urlpatterns = [
+        path('sitemap-products.xml', sitemap,
+             {'sitemaps': {'products': ProductSitemap}}),
+    ]
+
+Each ``<url>`` entry lists the imgix URLs of the images of its item as
+``<image:image>`` elements. The entries are produced a chunk of items at a
+time, with the URLs of each chunk built together, and streamed to the
+response (or written to a file with write_sitemap), so the memory used doesn't
+grow with the size of the sitemap.
+"""
+from django.apps import apps
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models.query import QuerySet
+from django.http import Http404, StreamingHttpResponse
+from django.utils.html import escape
+
+from .api import _chunks, build_imgix_urls
+
+SITEMAP_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+SITEMAP_FOOTER = '</urlset>\n'
+
+
+class ImgixImageSitemap(Sitemap):
+    """
+    A sitemap whose entries have the imgix URLs of the images returned by
+    ``images(item)``, built with ``imgix_alias`` and/or ``imgix_params``.
+    """
+    imgix_alias = None
+    imgix_params = {}
+
+    # Number of items whose image URLs are built at a time
+    chunk_size = 500
+
+    def images(self, item):
+        return []
+
+    def iter_urls(self, page=1, site=None, protocol=None):
+        """
+        Return a generator of the entries of a page, like get_urls, each with
+        the list of the imgix URLs of its images as ``images``.
+        """
+        protocol = self.protocol or protocol or 'http'
+        domain = self._get_domain(site)
+        object_list = self.paginator.page(page).object_list
+        return self._iter_urls(object_list, protocol, domain)
+
+    # The helpers of Sitemap.get_urls are only public from Django 3.2, so the
+    # domain and the attributes of the items are resolved here
+
+    def _get_domain(self, site=None):
+        if site is None and apps.is_installed('django.contrib.sites'):
+            Site = apps.get_model('sites.Site')
+            try:
+                site = Site.objects.get_current()
+            except Site.DoesNotExist:
+                pass
+        if site is None:
+            raise ImproperlyConfigured(
+                "To use sitemaps, either enable the sites framework or pass "
+                "a Site/RequestSite object in your view."
+            )
+        return site.domain
+
+    def _get_value(self, name, item):
+        value = getattr(self, name, None)
+        if callable(value):
+            return value(item)
+        return value
+
+    def _iter_urls(self, object_list, protocol, domain):
+        if isinstance(object_list, QuerySet):
+            object_list = object_list.iterator()
+
+        for chunk in _chunks(object_list, self.chunk_size):
+            images = [list(self._get_value('images', item) or ())
+                      for item in chunk]
+            urls = iter(build_imgix_urls(
+                [path for item_images in images for path in item_images],
+                self.imgix_alias, **self.imgix_params
+            ))
+            for item, item_images in zip(chunk, images):
+                priority = self._get_value('priority', item)
+                yield {
+                    'item': item,
+                    'location': '{0}://{1}{2}'.format(
+                        protocol, domain, self._get_value('location', item)),
+                    'lastmod': self._get_value('lastmod', item),
+                    'changefreq': self._get_value('changefreq', item),
+                    'priority': str(priority if priority is not None else ''),
+                    'images': [next(urls) for _ in item_images],
+                }
+
+    def get_urls(self, page=1, site=None, protocol=None):
+        return list(self.iter_urls(page, site, protocol))
+
+
+def format_url(url):
+    """
+    Return the ``<url>`` element of a sitemap entry.
+    """
+    parts = ['<url><loc>', escape(url['location']), '</loc>']
+    lastmod = url.get('lastmod')
+    if lastmod:
+        parts += ['<lastmod>', lastmod.strftime('%Y-%m-%d'), '</lastmod>']
+    if url.get('changefreq'):
+        parts += ['<changefreq>', url['changefreq'], '</changefreq>']
+    if url.get('priority'):
+        parts += ['<priority>', url['priority'], '</priority>']
+    for image in url.get('images', ()):
+        parts += ['<image:image><image:loc>', escape(image),
+                  '</image:loc></image:image>']
+    parts.append('</url>\n')
+    return ''.join(parts)
+
+
+def iter_sitemap_xml(sitemaps, page=1, site=None, protocol=None):
+    """
+    Return a generator of the pieces of the XML of a page of sitemaps.
+    """
+    yield SITEMAP_HEADER
+    for sitemap in sitemaps:
+        iter_urls = getattr(sitemap, 'iter_urls', sitemap.get_urls)
+        for url in iter_urls(page=page, site=site, protocol=protocol):
+            yield format_url(url)
+    yield SITEMAP_FOOTER
+
+
+def get_sitemaps(sitemaps, section=None):
+    if section is not None:
+        if section not in sitemaps:
+            raise Http404("No sitemap available for section: %r" % section)
+        sitemaps = [sitemaps[section]]
+    else:
+        sitemaps = sitemaps.values()
+    return [sitemap() if callable(sitemap) else sitemap
+            for sitemap in sitemaps]
+
+
+def write_sitemap(file, sitemaps, page=1, site=None, protocol=None):
+    """
+    Write a page of a dict of sitemaps (or of a list of them) to a file.
+    """
+    if isinstance(sitemaps, dict):
+        sitemaps = get_sitemaps(sitemaps)
+    for piece in iter_sitemap_xml(sitemaps, page, site, protocol):
+        file.write(piece)
+
+
+def sitemap(request, sitemaps, section=None,
+            content_type='application/xml'):
+    """
+    A streaming replacement for django.contrib.sitemaps.views.sitemap.
+    """
+    sitemaps = get_sitemaps(sitemaps, section)
+    page = request.GET.get('p', 1)
+
+    # Check the page before anything is sent
+    for site in sitemaps:
+        try:
+            site.paginator.validate_number(page)
+        except PageNotAnInteger:
+            raise Http404("No page '%s'" % page)
+        except EmptyPage:
+            raise Http404("Page %s empty" % page)
+
+    return StreamingHttpResponse(
+        iter_sitemap_xml(sitemaps, page, get_current_site(request),
+                         request.scheme),
+        content_type=content_type
+    )
@@ -1,98 +1,28 @@
 __author__ = 'daniel.kirov'
 
 import re
-try:
-    from urlparse import urlparse
-except ImportError:
-    # Python 3 location
-    from urllib.parse import urlparse
+import uuid
 
-from django.template import TemplateSyntaxError
-from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
 from django import template
+from django.template import TemplateSyntaxError
+from django.template.base import Variable, kwarg_re
 try:
     from django.utils.safestring import mark_safe
 except ImportError:
     mark_safe = lambda s: s
 
 from ._version import __version__
-
-import imgix
+from ..api import (
+    FM_MATCHES, FM_PATTERN, WH_PATTERN, build_imgix_picture,
+    build_imgix_srcset, build_imgix_url, format_picture, format_srcset,
+    get_arguments, get_fm, get_image_arguments, get_kwargs,
+    get_picture_items, get_srcset_items
+)
+from ..conf import get_config, get_settings_variables
+from ..lazy import imgix_url
 
 register = template.Library()
 
-WH_PATTERN = re.compile(r'(\d+)x(\d+)$')
-
-FM_PATTERN = re.compile(r'([^\?]+)')
-FM_MATCHES = {
-    'jpg': 'jpg',
-    'jpeg': 'jpg',
-    'png': 'png',
-    'gif': 'gif',
-    'jp2': 'jp2',
-    'jxr': 'jxr',
-    'webp': 'webp',
-}
-
-def get_settings_variables():
-    try:
-        use_https = settings.IMGIX_HTTPS
-    except AttributeError:
-        use_https = True
-    try:
-        sign_key = settings.IMGIX_SIGN_KEY
-    except AttributeError:
-        sign_key = None
-    try:
-        shard_strategy = settings.IMGIX_SHARD_STRATEGY
-    except AttributeError:
-        shard_strategy = None
-    try:
-        aliases = settings.IMGIX_ALIASES
-    except AttributeError:
-        aliases = None
-    try:
-        format_detect = settings.IMGIX_DETECT_FORMAT
-    except AttributeError:
-        format_detect = False
-    try:
-        web_proxy = settings.IMGIX_WEB_PROXY_SOURCE
-    except AttributeError:
-        web_proxy = False
-    return shard_strategy, sign_key, use_https, aliases, format_detect, web_proxy
-
-
-def get_kwargs(alias, aliases, kwargs):
-
-    # Check if we are using an alias or inline arguments
-    if not alias:
-        return kwargs
-    elif not aliases:
-        raise ImproperlyConfigured(
-            "No aliases set. Please set IMGIX_ALIASES in settings.py"
-        )
-    elif alias not in aliases:
-        raise ImproperlyConfigured(
-            "Alias {0} not found in IMGIX_ALIASES".format(alias)
-        )
-    else:
-        return aliases[alias]
-
-
-def get_fm(image_url):
-    image_end = image_url.split('.')[-1]
-    m = FM_PATTERN.match(image_end)
-    if m:
-        fm = m.group(1)
-        try:
-            format = FM_MATCHES[fm]
-            return format
-        except:
-            return False
-    else:
-        return False
-
 """
 Template tag for returning an image from imgix.
 
@@ -125,72 +55,282 @@ This template tag returns a string that represents the imgix URL for the image.
 """
 
 
-@register.simple_tag
 def get_imgix(image_url, alias=None, wh=None, **kwargs):
 
-    try:
-        domains = settings.IMGIX_DOMAINS
-    except:
-        raise ImproperlyConfigured(
-            "IMGIX_DOMAINS not set in settings.py"
+    return mark_safe(build_imgix_url(image_url, alias, wh, **kwargs))
+
+
+def is_literal(expression):
+    """
+    Whether a compiled tag argument is a string or number literal.
+    """
+    if expression.filters:
+        return False
+    var = expression.var
+    return not isinstance(var, Variable) or (
+        var.lookups is None and not var.translate)
+
+
+class ImgixNode(template.Node):
+    """
+    Outputs the URL of an image, or with ``as`` assigns it to a variable as a
+    lazy ImgixURL, which is only built if it is output.
+
+    When all the arguments are literals, the URL is only built on the first
+    render and kept on the node (so in the cached template) for as long as the
+    configuration it was built with is the current one. With IMGIX_METRICS,
+    the later renders are counted as cache hits.
+    """
+
+    def __init__(self, args, kwargs, target_var=None):
+        self.args = args
+        self.kwargs = kwargs
+        self.target_var = target_var
+        self.literal = target_var is None and all(
+            is_literal(value) for value in args + list(kwargs.values()))
+        self._folded = None
+
+    def render(self, context):
+        if self.literal:
+            config = get_config()
+            folded = self._folded
+            if folded is not None and folded[0] is config:
+                if config.metrics:
+                    from ..metrics import record_hit
+                    record_hit()
+                return folded[1]
+            if config.is_deterministic():
+                # Built right away, even in an imgix_batch block
+                args, kwargs = self.resolve_arguments(context)
+                url = get_imgix(*args, **kwargs)
+                self._folded = (config, url)
+                return url
+
+        args, kwargs = self.resolve_arguments(context)
+        if self.target_var is not None:
+            context[self.target_var] = imgix_url(*args, **kwargs)
+            return ''
+        return get_imgix_tag(context, *args, **kwargs)
+
+    def resolve_arguments(self, context):
+        args = [arg.resolve(context) for arg in self.args]
+        kwargs = dict(
+            (key, value.resolve(context)) for key, value in self.kwargs.items()
+        )
+        return args, kwargs
+
+
+def get_imgix_tag(context, image_url, alias=None, wh=None, **kwargs):
+
+    batch = context.get(BATCH_VARIABLE)
+    if batch is None:
+        return get_imgix(image_url, alias, wh, **kwargs)
+
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    return batch.add([get_image_arguments(config, image_url, arguments)])
+
+
+def parse_imgix_bits(parser, bits, name):
+    """
+    Split the arguments of an imgix tag into positional arguments (at most
+    image_url, alias and wh), keyword arguments and the ``as`` variable.
+    """
+    target_var = None
+    if len(bits) >= 2 and bits[-2] == 'as':
+        target_var = bits[-1]
+        bits = bits[:-2]
+
+    args = []
+    kwargs = {}
+    for bit in bits:
+        match = kwarg_re.match(bit)
+        if match and match.group(1):
+            key, value = match.groups()
+            if key in kwargs:
+                raise TemplateSyntaxError(
+                    "%r received multiple values for keyword argument %r"
+                    % (name, key)
+                )
+            kwargs[key] = parser.compile_filter(value)
+        elif kwargs:
+            raise TemplateSyntaxError(
+                "%r received some positional argument(s) after some "
+                "keyword argument(s)" % name
+            )
+        else:
+            args.append(parser.compile_filter(bit))
+
+    if not args:
+        raise TemplateSyntaxError(
+            "%r did not receive value(s) for the argument(s): 'image_url'"
+            % name
+        )
+    if len(args) > 3:
+        raise TemplateSyntaxError(
+            "%r received too many positional arguments" % name
         )
+    return args, kwargs, target_var
+
+
+@register.tag(name='get_imgix')
+def get_imgix_node(parser, token):
+    bits = token.split_contents()
+    args, kwargs, target_var = parse_imgix_bits(parser, bits[1:], bits[0])
+    return ImgixNode(args, kwargs, target_var)
 
-    ### Build arguments
-    args = {}
 
-    # Get arguments from settings
-    shard_strategy, sign_key, use_https, aliases,\
-        format_detect, web_proxy = get_settings_variables()
+"""
+Template tag for returning a srcset for an image from imgix.
+
+This template tag takes the same arguments as get_imgix, plus an optional
+``widths`` argument (e.g. widths='320,640,1280') overriding the
+IMGIX_SRCSET_WIDTHS setting, and returns a string that can be used as the
+``srcset`` attribute of an <img> tag.
+"""
 
-    args['use_https'] = use_https
 
-    if sign_key:
-        args['sign_key'] = sign_key
+def get_imgix_srcset(image_url, alias=None, wh=None, **kwargs):
 
-    if shard_strategy:
-        args['shard_strategy'] = shard_strategy
+    return mark_safe(build_imgix_srcset(image_url, alias, wh, **kwargs))
 
 
-    # Get builder instance
-    builder = imgix.UrlBuilder(
-        domains,
-        **args
+@register.simple_tag(takes_context=True, name='get_imgix_srcset')
+def get_imgix_srcset_tag(context, image_url, alias=None, wh=None,
+                         widths=None, **kwargs):
+
+    batch = context.get(BATCH_VARIABLE)
+    if batch is None:
+        return get_imgix_srcset(image_url, alias, wh, widths=widths, **kwargs)
+
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    widths, items = get_srcset_items(config, path, arguments, widths)
+    return batch.add(items, widths)
+
+
+"""
+Template tag for returning a <picture> element for an image from imgix.
+
+This template tag takes the same arguments as get_imgix_srcset, plus an
+optional ``formats`` argument (e.g. formats='avif,webp') overriding the
+IMGIX_PICTURE_FORMATS setting, and the HTML attributes of the fallback <img>
+(alt, sizes, class...). It returns a <picture> with a <source> and its srcset
+for each format, and an <img> with the URL and srcset of the image as
+get_imgix and get_imgix_srcset would output them:
+
+        {% imgix_picture product.image.url 'thumb' alt=product.name
+                         sizes='(min-width: 1024px) 50vw, 100vw' %}
+"""
+
+# Arguments of imgix_picture that are HTML attributes, not imgix parameters
+PICTURE_ATTRIBUTES = (
+    'alt', 'sizes', 'class', 'id', 'title', 'style', 'width', 'height',
+    'loading', 'decoding', 'fetchpriority',
+)
+
+
+@register.simple_tag(takes_context=True, name='imgix_picture')
+def imgix_picture_tag(context, image_url, alias=None, wh=None, widths=None,
+                      formats=None, **kwargs):
+
+    attrs = dict(
+        (name, kwargs.pop(name)) for name in PICTURE_ATTRIBUTES
+        if name in kwargs
+    )
+    batch = context.get(BATCH_VARIABLE)
+    if batch is None:
+        return build_imgix_picture(image_url, alias, wh, widths=widths,
+                                   formats=formats, attrs=attrs, **kwargs)
+
+    config = get_config()
+    arguments = get_arguments(config, alias, wh, kwargs)
+    path, arguments = get_image_arguments(config, image_url, arguments)
+    widths, sources, items = get_picture_items(
+        config, path, arguments, widths, formats)
+    return format_picture(
+        [(mime_type, batch.add(source_items, widths))
+         for mime_type, source_items in sources],
+        batch.add([(path, arguments)]), batch.add(items, widths), attrs
     )
 
-    # Has the wh argument been passed? If yes,
-    # set w and h arguments accordingly
-    if wh:
-        size = wh
-        if isinstance(size, str):
-            m = WH_PATTERN.match(size)
-            if m:
-                w = int(m.group(1))
-                h = int(m.group(2))
-                if w > 0:
-                    kwargs['w'] = int(m.group(1))
-                if h > 0:
-                    kwargs['h'] = int(m.group(2))
+
+"""
+Block tag for building every imgix URL in a block at once.
+
+Each get_imgix and get_imgix_srcset tag inside the block outputs a
+placeholder instead of a URL. Once the block is rendered, the URLs for all of
+them are built together (with a single get_many/set_many when IMGIX_CACHE is
+set) and substituted for the placeholders:
+
+        {% imgix_batch %}
+            {% for product in products %}
+                <img src="{% get_imgix product.image.url 'thumb' %}"/>
+            {% endfor %}
+        {% end_imgix_batch %}
+
+A srcset assigned to a variable with ``as`` inside the block is a placeholder
+too, so it must be output unmodified and inside the block. A URL assigned with
+``as`` is a lazy ImgixURL and is built on its own when it is output.
+"""
+
+BATCH_VARIABLE = '_imgix_batch'
+
+
+class ImgixBatch(object):
+
+    def __init__(self):
+        self.prefix = '__imgix_batch_{0}_'.format(uuid.uuid4().hex[:12])
+        self.pattern = re.compile(re.escape(self.prefix) + r'(\d+)__')
+        self.items = []
+        self.outputs = []
+
+    def add(self, items, widths=None):
+        """
+        Queue the ``(path, arguments)`` of a URL, or of all the URLs of a
+        srcset if widths is given, and return the placeholder for it.
+        """
+        start = len(self.items)
+        self.items.extend(items)
+        self.outputs.append((start, len(self.items), widths))
+        return mark_safe(
+            self.prefix + str(len(self.outputs) - 1) + '__'
+        )
+
+    def resolve(self, output):
+        if not self.outputs:
+            return output
+
+        urls = get_config().create_urls(self.items)
+        values = []
+        for start, stop, widths in self.outputs:
+            if widths is None:
+                values.append(urls[start])
             else:
-                raise TemplateSyntaxError(
-                    "%r is not a valid size." % size
-                )
+                values.append(format_srcset(widths, urls[start:stop]))
+        return self.pattern.sub(lambda m: values[int(m.group(1))], output)
 
-    # Is format detection on? If yes, use the appropriate image format.
 
-    arguments = get_kwargs(alias, aliases, kwargs)
+class ImgixBatchNode(template.Node):
 
-    if format_detect and 'fm' not in arguments:
-        fm = get_fm(image_url)
-        if fm:
-            arguments['fm'] = fm
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
 
-    # Take only the relative path of the URL if the source is not a Web Proxy Source
-    if not web_proxy:
-        image_url = urlparse(image_url).path
+    def render(self, context):
+        batch = ImgixBatch()
+        with context.push(**{BATCH_VARIABLE: batch}):
+            output = self.nodelist.render(context)
+        return mark_safe(batch.resolve(output))
 
-    # URLs should append an 'ixlib=django-<version_number>' parameter
-    arguments['ixlib'] = "django-" + __version__
 
-    # Build the imgix URL
-    url = builder.create_url(image_url, arguments)
-    return mark_safe(url)
+@register.tag
+def imgix_batch(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 1:
+        raise TemplateSyntaxError(
+            "%r tag takes no arguments" % bits[0]
+        )
+    nodelist = parser.parse(('end_imgix_batch',))
+    parser.delete_first_token()
+    return ImgixBatchNode(nodelist)
@@ -1,9 +1,75 @@
-from django.template import Context, Template
-from django.test import TestCase
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+import xml.etree.ElementTree as ElementTree
+from unittest import skipIf
+from collections import Counter
+from types import ModuleType
+
+import imgix
+try:
+    from django.apps import apps
+except ImportError:
+    # Django < 1.7
+    apps = None
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.models import Site
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.template import Context, Template, TemplateSyntaxError
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 from django.conf import settings
+from django.db import models
 from django.core.exceptions import ImproperlyConfigured
-
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+try:
+    from asgiref.sync import async_to_sync
+    from django_imgix.aio import abuild_imgix_url, abuild_imgix_urls
+except (ImportError, SyntaxError):
+    async_to_sync = None
+try:
+    from concurrent.futures import ProcessPoolExecutor
+    from django_imgix.parallel import (
+        get_worker_options, iter_imgix_urls_parallel
+    )
+except ImportError:
+    iter_imgix_urls_parallel = None
+
+from django_imgix import (
+    ImgixURL, build_imgix_picture, build_imgix_srcset, build_imgix_url,
+    build_imgix_urls, imgix_url, iter_imgix_urls
+)
+from django_imgix.aliases import compile_aliases, encode_query
+from django_imgix.buckets import SizeBuckets, size_bucket_info
+from django_imgix.cache import LRUCache, get_cache, url_cache_info
+from django_imgix.conf import get_config
+from django_imgix.engine import URLEngine
+from django_imgix.formats import get_extension
+from django_imgix.manifest import StaleManifestWarning
+from django_imgix.metrics import (
+    get_current as get_current_metrics, start as start_metrics,
+    stop as stop_metrics
+)
+from django_imgix.middleware import ImgixMetricsMiddleware
+from django_imgix.models import ImgixFileField
+from django_imgix.normalize import NonCanonicalParameterWarning, normalize_params
+from django_imgix.sharding import ShardSelector
+from django_imgix.signing import PrefixSigner
+from django_imgix.sitemaps import ImgixImageSitemap, sitemap, write_sitemap
 from django_imgix.templatetags._version import __version__
+from django_imgix.templatetags.imgix_tags import get_fm, get_imgix
 
 def render_template(string, context=None):
         context = context or {}
@@ -436,3 +502,2395 @@ class DetectFormatTests(TestCase):
             )
 
 
+    def test_query_string_dots_are_ignored(self):
+
+        domains = 'test1.imgix.net'
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_DETECT_FORMAT=True):
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix 'media/image/image_0001.png?v=1.2' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.png?fm=png&ixlib=python-{0}".format(__version__)
+            )
+
+
+    def test_formats_can_be_extended_in_settings(self):
+
+        domains = 'test1.imgix.net'
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_DETECT_FORMAT=True,
+                           IMGIX_FORMATS={'avif': 'avif', 'png': None}):
+            self.assertEqual(
+                get_imgix('media/image/image_0001.AVIF'),
+                "https://test1.imgix.net/media/image/image_0001.AVIF?fm=avif&ixlib=python-{0}".format(__version__)
+            )
+            self.assertEqual(
+                get_imgix('media/image/image_0001.png'),
+                "https://test1.imgix.net/media/image/image_0001.png?ixlib=python-{0}".format(__version__)
+            )
+
+
+    def test_get_extension(self):
+
+        cases = [
+            ('media/image/image_0001.jpg', 'jpg'),
+            ('media/image/image_0001.JPEG', 'jpeg'),
+            ('https://example.com/image.png?v=1.2', 'png'),
+            ('/image.gif#section.2', 'gif'),
+            ('/image.webp?a=b#c.d', 'webp'),
+            ('/image.webp#c?d.e', 'webp'),
+            ('/media.v2/image', ''),
+            ('/media/image', ''),
+            ('image.', ''),
+            ('', ''),
+        ]
+        for url, extension in cases:
+            self.assertEqual(get_extension(url), extension, url)
+
+
+    def test_get_fm_returns_false_for_unknown_formats(self):
+
+        self.assertEqual(get_fm('media/image/image_0001.jpeg'), 'jpg')
+        self.assertIs(get_fm('media/image/image_0001.tiff'), False)
+
+
+    def test_old_names_are_still_exported(self):
+
+        from django_imgix.templatetags.imgix_tags import (
+            FM_MATCHES, FM_PATTERN
+        )
+        self.assertEqual(FM_PATTERN.match('png?w=100').group(1), 'png')
+        self.assertEqual(FM_MATCHES['jpeg'], 'jpg')
+
+
+# Tests related to the process-wide settings/builder cache
+class ConfigCacheTests(TestCase):
+
+
+    def test_config_is_reused_between_calls(self):
+
+        domains = 'test1.imgix.net'
+
+        with self.settings(IMGIX_DOMAINS=domains):
+            get_imgix('media/image/image_0001.jpg')
+            config = get_config()
+            get_imgix('media/image/image_0002.jpg')
+            self.assertIs(get_config(), config)
+
+
+    def test_setting_change_invalidates_config(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            config = get_config()
+
+        with self.settings(IMGIX_DOMAINS='test2.imgix.net'):
+            self.assertIsNot(get_config(), config)
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix 'media/image/image_0001.jpg' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test2.imgix.net/media/image/image_0001.jpg?ixlib=python-{0}".format(__version__)
+            )
+
+
+    def test_missing_domains_gives_useful_error(self):
+
+        with self.settings(IMGIX_HTTPS=True):
+            with self.assertRaises(ImproperlyConfigured) as cm:
+                get_config()
+            self.assertEqual(
+                str(cm.exception),
+                "IMGIX_DOMAINS not set in settings.py"
+            )
+
+
+# Tests related to the IMGIX_URL_CACHE_SIZE option
+class URLCacheTests(TestCase):
+
+
+    def test_url_cache_is_disabled_by_default(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            self.assertIsNone(get_config().url_cache)
+            self.assertIsNone(url_cache_info())
+
+
+    def test_repeated_urls_are_served_from_cache(self):
+
+        domains = 'test1.imgix.net'
+        key = '1234test'
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_SIGN_KEY=key,
+                           IMGIX_URL_CACHE_SIZE=10):
+            first = get_imgix('media/image/image_0001.jpg')
+            second = get_imgix('media/image/image_0001.jpg?v=2')
+            self.assertEqual(first, second)
+            self.assertEqual(
+                second,
+                "https://test1.imgix.net/media/image/image_0001.jpg?ixlib=python-{0}&s=69cce16d20a22e7bd5dbb53a2c276827".format(__version__)
+            )
+            info = url_cache_info()
+            self.assertEqual(info['hits'], 1)
+            self.assertEqual(info['misses'], 1)
+            self.assertEqual(info['size'], 1)
+
+
+    def test_arguments_are_part_of_the_cache_key(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_URL_CACHE_SIZE=10):
+            small = get_imgix('media/image/image_0001.jpg', w=100)
+            large = get_imgix('media/image/image_0001.jpg', w=200)
+            self.assertNotEqual(small, large)
+            self.assertEqual(url_cache_info()['misses'], 2)
+
+
+    def test_value_types_are_part_of_the_cache_key(self):
+
+        for first, second in [({'q': 70}, {'q': 70.0}),
+                              ({'w': 1}, {'w': True})]:
+            with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+                expected = build_imgix_url('x.jpg', **second)
+            with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                               IMGIX_URL_CACHE_SIZE=10):
+                build_imgix_url('x.jpg', **first)
+                self.assertEqual(build_imgix_url('x.jpg', **second), expected)
+                self.assertEqual(url_cache_info()['misses'], 2)
+
+
+    def test_least_recently_used_url_is_evicted(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_URL_CACHE_SIZE=2):
+            get_imgix('media/image/image_0001.jpg')
+            get_imgix('media/image/image_0002.jpg')
+            get_imgix('media/image/image_0001.jpg')
+            get_imgix('media/image/image_0003.jpg')
+            info = url_cache_info()
+            self.assertEqual(info['size'], 2)
+            self.assertEqual(info['evictions'], 1)
+            get_imgix('media/image/image_0001.jpg')
+            self.assertEqual(url_cache_info()['hits'], 2)
+
+
+    def test_cached_urls_match_crc_sharding(self):
+
+        domains = [
+            'test1.imgix.net',
+            'test2.imgix.net',
+            'test3.imgix.net',
+        ]
+        paths = ['media/image/image_{0:04d}.jpg'.format(i) for i in range(20)]
+
+        with self.settings(IMGIX_DOMAINS=domains):
+            expected = [get_imgix(path) for path in paths]
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_URL_CACHE_SIZE=100):
+            for _ in range(2):
+                self.assertEqual([get_imgix(path) for path in paths], expected)
+            self.assertEqual(url_cache_info()['hits'], len(paths))
+
+
+    def test_cycle_sharding_is_not_cached(self):
+
+        domains = [
+            'test1.imgix.net',
+            'test2.imgix.net',
+        ]
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_SHARD_STRATEGY='cycle',
+                           IMGIX_URL_CACHE_SIZE=100):
+            self.assertIsNone(get_config().url_cache)
+            first = get_imgix('media/image/image_0001.jpg')
+            second = get_imgix('media/image/image_0001.jpg')
+            self.assertNotEqual(first, second)
+
+
+    def test_lru_cache_counters(self):
+
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(
+            cache.info(),
+            {'hits': 1, 'misses': 2, 'evictions': 1, 'size': 2, 'maxsize': 2}
+        )
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.info()['misses'], 0)
+
+
+# Tests related to the compilation of IMGIX_ALIASES
+class CompiledAliasTests(TestCase):
+
+
+    def test_alias_settings_are_not_modified(self):
+
+        domains = 'test1.imgix.net'
+        aliases = {
+            'alias_one': {'w': 150, 'h': 350, 'auto': 'format'},
+        }
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_DETECT_FORMAT=True,
+                           IMGIX_ALIASES=aliases):
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix 'media/image/image_0001.jpg' 'alias_one' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.jpg?auto=format&fm=jpg&h=350&ixlib=python-{0}&w=150".format(__version__)
+            )
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix 'media/image/image_0001.png' 'alias_one' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.png?auto=format&fm=png&h=350&ixlib=python-{0}&w=150".format(__version__)
+            )
+        self.assertEqual(
+            aliases,
+            {'alias_one': {'w': 150, 'h': 350, 'auto': 'format'}}
+        )
+
+
+    def test_compiled_alias_is_sorted_and_encoded(self):
+
+        compiled = compile_aliases({
+            'alias_one': {'w': 150, 'txt': 'a&b c', 'auto': 'format',
+                          'mark64': 'https://assets.imgix.net/logo.png',
+                          'trim': None},
+        })
+        alias = compiled['alias_one']
+        self.assertEqual(
+            alias.params,
+            (('auto', 'format'),
+             ('mark64', 'https://assets.imgix.net/logo.png'),
+             ('trim', None), ('txt', 'a&b c'), ('w', 150))
+        )
+        self.assertEqual(
+            encode_query(alias.params),
+            "auto=format&mark64=aHR0cHM6Ly9hc3NldHMuaW1naXgubmV0L2xvZ28ucG5n"
+            "&txt=a%26b%20c&w=150"
+        )
+
+
+    def test_compiled_alias_arguments_are_a_copy(self):
+
+        alias = compile_aliases({'alias_one': {'w': 150}})['alias_one']
+        arguments = alias.arguments()
+        arguments['fm'] = 'png'
+        self.assertEqual(alias.arguments(), {'w': 150})
+
+
+    def test_aliases_must_be_a_dict(self):
+
+        with self.assertRaises(ImproperlyConfigured) as cm:
+            compile_aliases(['alias_one'])
+        self.assertEqual(
+            str(cm.exception),
+            "IMGIX_ALIASES must be a dict of alias names to parameters"
+        )
+
+
+    def test_alias_parameters_must_be_a_dict(self):
+
+        with self.assertRaises(ImproperlyConfigured) as cm:
+            compile_aliases({'alias_one': 'w=150'})
+        self.assertEqual(
+            str(cm.exception),
+            "Alias alias_one in IMGIX_ALIASES must be a dict of parameters"
+        )
+
+
+    def test_alias_parameter_values_are_validated(self):
+
+        with self.assertRaises(ImproperlyConfigured) as cm:
+            compile_aliases({'alias_one': {'w': [150]}})
+        self.assertEqual(
+            str(cm.exception),
+            "Alias alias_one in IMGIX_ALIASES has an invalid value [150] "
+            "for parameter w"
+        )
+
+
+    @skipIf(apps is None, "app configs require Django 1.7")
+    def test_bad_aliases_are_reported_when_the_app_is_ready(self):
+
+        app_config = apps.get_app_config('django_imgix')
+
+        with self.settings(IMGIX_ALIASES={'alias_one': None}):
+            with self.assertRaises(ImproperlyConfigured):
+                app_config.ready()
+
+
+    @skipIf(apps is None, "app configs require Django 1.7")
+    def test_aliases_compiled_when_the_app_is_ready_are_reused(self):
+
+        app_config = apps.get_app_config('django_imgix')
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_NORMALIZE=True,
+                           IMGIX_ALIASES={'alias_one': {'w': '150'}}):
+            with mock.patch('django_imgix.conf.compile_aliases',
+                            wraps=compile_aliases) as compile:
+                app_config.ready()
+                aliases = get_config().aliases
+            self.assertEqual(compile.call_count, 1)
+            self.assertEqual(aliases['alias_one'].params, (('w', 150),))
+
+        with self.settings(IMGIX_NORMALIZE='yes'):
+            with self.assertRaises(ImproperlyConfigured):
+                app_config.ready()
+
+
+# Tests related to building URLs from Python code
+class BuildImgixUrlsTests(TestCase):
+
+
+    def test_batch_matches_get_imgix(self):
+
+        domains = [
+            'test1.imgix.net',
+            'test2.imgix.net',
+        ]
+        aliases = {
+            'alias_one': {'w': 150, 'h': 350, 'auto': 'format'},
+        }
+        paths = [
+            'media/image/image_0001.jpg',
+            '/media/image/image_0002.png?v=2',
+            'https://example.com/media/image/image_0003.gif',
+            'media/image/image_0004',
+        ]
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_SIGN_KEY='1234test',
+                           IMGIX_DETECT_FORMAT=True,
+                           IMGIX_ALIASES=aliases):
+            for kwargs in [{}, {'alias': 'alias_one'}, {'wh': '100x0', 'q': 70}]:
+                self.assertEqual(
+                    build_imgix_urls(paths, **kwargs),
+                    [get_imgix(path, **kwargs) for path in paths]
+                )
+
+
+    def test_iter_imgix_urls_is_lazy(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            paths = ('media/image/image_{0:04d}.jpg'.format(i) for i in range(3))
+            urls = iter_imgix_urls(paths, w=100)
+            self.assertEqual(
+                next(urls),
+                "https://test1.imgix.net/media/image/image_0000.jpg?ixlib=python-{0}&w=100".format(__version__)
+            )
+            self.assertEqual(len(list(urls)), 2)
+
+
+    def test_batch_errors_are_raised_before_iteration(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=None):
+            with self.assertRaises(ImproperlyConfigured):
+                iter_imgix_urls(['media/image/image_0001.jpg'], 'alias_one')
+
+
+    def test_build_imgix_url(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            self.assertEqual(
+                build_imgix_url('media/image/image_0001.jpg', wh='1024x768'),
+                "https://test1.imgix.net/media/image/image_0001.jpg?h=768&ixlib=python-{0}&w=1024".format(__version__)
+            )
+
+
+# Tests related to the get_imgix_srcset template tag
+class SrcsetTests(TestCase):
+
+
+    def test_default_width_ladder(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            widths = get_config().srcset_widths
+            self.assertEqual(widths[:4], (100, 116, 135, 156))
+            self.assertEqual(widths[-1], 8192)
+            self.assertEqual(len(widths), 31)
+
+
+    def test_width_ladder_from_settings(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SRCSET_MIN_WIDTH=200,
+                           IMGIX_SRCSET_MAX_WIDTH=400,
+                           IMGIX_SRCSET_TOLERANCE=0.25):
+            self.assertEqual(get_config().srcset_widths, (200, 300, 400))
+
+
+    def test_invalid_width_ladder_gives_useful_error(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SRCSET_MIN_WIDTH=400,
+                           IMGIX_SRCSET_MAX_WIDTH=200):
+            self.assertRaises(ImproperlyConfigured, get_config)
+
+
+    def test_srcset_is_rendered(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SRCSET_WIDTHS=[320, 640]):
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix_srcset 'media/image/image_0001.jpg' auto='format' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.jpg?auto=format&ixlib=python-{0}&w=320 320w, "
+                "https://test1.imgix.net/media/image/image_0001.jpg?auto=format&ixlib=python-{0}&w=640 640w".format(__version__)
+            )
+
+
+    def test_srcset_keeps_alias_aspect_ratio(self):
+
+        aliases = {
+            'alias_one': {'w': 150, 'h': 100, 'fit': 'crop'},
+        }
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_DETECT_FORMAT=True,
+                           IMGIX_ALIASES=aliases):
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix_srcset 'media/image/image_0001.png' 'alias_one' widths='300,450' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.png?fit=crop&fm=png&h=200&ixlib=python-{0}&w=300 300w, "
+                "https://test1.imgix.net/media/image/image_0001.png?fit=crop&fm=png&h=300&ixlib=python-{0}&w=450 450w".format(__version__)
+            )
+
+
+    def test_srcset_urls_match_get_imgix(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIGN_KEY='1234test'):
+            srcset = build_imgix_srcset(
+                'media/image/image_0001.jpg', wh='1024x768', widths=[512])
+            self.assertEqual(
+                srcset,
+                get_imgix('media/image/image_0001.jpg', w=512, h=384) + ' 512w'
+            )
+
+
+    def test_invalid_widths_give_useful_error(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            with self.assertRaises(TemplateSyntaxError):
+                build_imgix_srcset('media/image/image_0001.jpg', widths='big')
+
+
+
+class CountingCache(LocMemCache):
+    """
+    A local stand-in for a shared cache (e.g. Redis) that counts round-trips.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingCache, self).__init__(*args, **kwargs)
+        self.calls = []
+        self._in_get_many = False
+
+    def get(self, *args, **kwargs):
+        if not self._in_get_many:
+            self.calls.append('get')
+        return super(CountingCache, self).get(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        self.calls.append('get_many')
+        self._in_get_many = True
+        try:
+            return super(CountingCache, self).get_many(*args, **kwargs)
+        finally:
+            self._in_get_many = False
+
+    def set_many(self, *args, **kwargs):
+        self.calls.append('set_many')
+        return super(CountingCache, self).set_many(*args, **kwargs)
+
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'imgix': {
+        'BACKEND': 'django_imgix.tests.tests.CountingCache',
+        'LOCATION': 'imgix-tests',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
+# Tests related to the IMGIX_CACHE option
+class SharedURLCacheTests(TestCase):
+
+
+    def shared_cache_settings(self, **kwargs):
+        options = {
+            'CACHES': SHARED_CACHES,
+            'IMGIX_DOMAINS': 'test1.imgix.net',
+            'IMGIX_CACHE': 'imgix',
+        }
+        options.update(kwargs)
+        return self.settings(**options)
+
+
+    def test_urls_are_stored_in_shared_cache(self):
+
+        with self.shared_cache_settings(IMGIX_SIGN_KEY='1234test'):
+            get_cache('imgix').clear()
+            url = get_imgix('media/image/image_0001.jpg')
+            shared_cache = get_config().shared_cache
+            key = shared_cache.make_key(
+                'media/image/image_0001.jpg',
+                {'ixlib': 'django-{0}'.format(__version__)})
+            self.assertEqual(get_cache('imgix').get(key), url)
+            self.assertTrue(key.startswith('imgix:'))
+            self.assertLess(len(key), 64)
+
+
+    def test_urls_are_served_from_shared_cache(self):
+
+        with self.shared_cache_settings():
+            get_cache('imgix').clear()
+            key = get_config().shared_cache.make_key(
+                'media/image/image_0001.jpg',
+                {'ixlib': 'django-{0}'.format(__version__)})
+            get_cache('imgix').set(key, 'https://cached.imgix.net/image.jpg')
+            self.assertEqual(
+                get_imgix('media/image/image_0001.jpg'),
+                'https://cached.imgix.net/image.jpg'
+            )
+
+
+    def test_settings_change_changes_keys(self):
+
+        with self.shared_cache_settings():
+            unsigned = get_config().fingerprint
+        with self.shared_cache_settings(IMGIX_SIGN_KEY='1234test'):
+            signed = get_config().fingerprint
+        with self.shared_cache_settings(IMGIX_DOMAINS='test2.imgix.net'):
+            other_domain = get_config().fingerprint
+        self.assertEqual(len(set([unsigned, signed, other_domain])), 3)
+
+
+    def test_batch_uses_one_round_trip(self):
+
+        paths = ['media/image/image_{0:04d}.jpg'.format(i) for i in range(20)]
+
+        with self.shared_cache_settings():
+            get_cache('imgix').clear()
+            expected = [get_imgix(path) for path in paths]
+            get_cache('imgix').clear()
+            cache = get_cache('imgix')
+            cache.calls = []
+
+            self.assertEqual(build_imgix_urls(paths), expected)
+            self.assertEqual(cache.calls, ['get_many', 'set_many'])
+
+            cache.calls = []
+            self.assertEqual(build_imgix_urls(paths), expected)
+            self.assertEqual(cache.calls, ['get_many'])
+
+
+    def test_srcset_uses_one_round_trip(self):
+
+        with self.shared_cache_settings(IMGIX_SRCSET_WIDTHS=[100, 200, 300]):
+            get_cache('imgix').clear()
+            cache = get_cache('imgix')
+            cache.calls = []
+            build_imgix_srcset('media/image/image_0001.jpg')
+            self.assertEqual(cache.calls, ['get_many', 'set_many'])
+
+
+    def test_url_cache_is_checked_first(self):
+
+        with self.shared_cache_settings(IMGIX_URL_CACHE_SIZE=10):
+            get_cache('imgix').clear()
+            cache = get_cache('imgix')
+            get_imgix('media/image/image_0001.jpg')
+            cache.calls = []
+            get_imgix('media/image/image_0001.jpg')
+            build_imgix_urls(['media/image/image_0001.jpg'])
+            self.assertEqual(cache.calls, [])
+
+
+    def test_unknown_cache_gives_useful_error(self):
+
+        with self.shared_cache_settings(IMGIX_CACHE='missing'):
+            with self.assertRaises(ImproperlyConfigured) as cm:
+                get_config()
+            self.assertEqual(
+                str(cm.exception),
+                "IMGIX_CACHE missing is not one of the caches in CACHES"
+            )
+
+
+# Tests related to the imgix_batch block tag
+class BatchTagTests(TestCase):
+
+
+    def test_batch_renders_the_same_urls(self):
+
+        aliases = {
+            'alias_one': {'w': 150, 'h': 350, 'auto': 'format'},
+        }
+        template = (
+            "{% load imgix_tags %}"
+            "{% for path in paths %}"
+            "<img src=\"{% get_imgix path 'alias_one' %}\" "
+            "srcset=\"{% get_imgix_srcset path widths='100,200' %}\"/>"
+            "{% endfor %}"
+        )
+        context = {
+            'paths': ['media/image/image_{0:04d}.jpg'.format(i)
+                      for i in range(12)],
+        }
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIGN_KEY='1234test',
+                           IMGIX_ALIASES=aliases):
+            expected = render_template(template, context)
+            rendered = render_template(
+                template.replace(
+                    "{% for", "{% imgix_batch %}{% for", 1) +
+                "{% end_imgix_batch %}",
+                context
+            )
+            self.assertEqual(rendered, expected)
+            self.assertNotIn('__imgix_batch_', rendered)
+
+
+    def test_batch_uses_one_round_trip(self):
+
+        template = (
+            "{% load imgix_tags %}"
+            "{% imgix_batch %}"
+            "{% for path in paths %}{% get_imgix path w=100 %}{% endfor %}"
+            "{% get_imgix_srcset 'media/image/hero.jpg' widths='100,200' %}"
+            "{% end_imgix_batch %}"
+        )
+        context = {
+            'paths': ['media/image/image_{0:04d}.jpg'.format(i)
+                      for i in range(300)],
+        }
+
+        with self.settings(CACHES=SHARED_CACHES,
+                           IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_CACHE='imgix'):
+            cache = get_cache('imgix')
+            cache.clear()
+            cache.calls = []
+            render_template(template, context)
+            self.assertEqual(cache.calls, ['get_many', 'set_many'])
+
+            cache.calls = []
+            render_template(template, context)
+            self.assertEqual(cache.calls, ['get_many'])
+
+
+    def test_batch_urls_are_available_in_included_templates(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% imgix_batch %}"
+                "{% include inner %}"
+                "{% end_imgix_batch %}",
+                {'inner': Template(
+                    "{% load imgix_tags %}"
+                    "{% get_imgix 'media/image/image_0001.jpg' %}"
+                )}
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.jpg?ixlib=python-{0}".format(__version__)
+            )
+
+
+    def test_errors_are_raised_by_the_tag(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=None):
+            with self.assertRaises(ImproperlyConfigured):
+                render_template(
+                    "{% load imgix_tags %}"
+                    "{% imgix_batch %}"
+                    "{% get_imgix 'media/image/image_0001.jpg' 'alias_one' %}"
+                    "{% end_imgix_batch %}"
+                )
+
+
+    def test_batch_takes_no_arguments(self):
+
+        with self.assertRaises(TemplateSyntaxError):
+            render_template(
+                "{% load imgix_tags %}"
+                "{% imgix_batch 'x' %}{% end_imgix_batch %}"
+            )
+
+
+SIGNING_CORPUS = [
+    ('media/image/image_0001.jpg', {}),
+    ('/media/image/image_0001.jpg', {'w': 100, 'h': 200, 'fit': 'crop'}),
+    ('/media/image/image 0001.jpg', {'txt': 'Hello, world & more'}),
+    ('/media/images/café.png', {'q': 70.5, 'auto': 'format,compress'}),
+    ('https://example.com/image.jpg?size=large', {'w': 300}),
+    ('i.imgur.net/media/image/image_0001.jpg', {'fm': 'png'}),
+    ('/media/image/image_0001.jpg', {'mark64': 'https://assets.imgix.net/logo.png',
+                                     'lossless': True, 'trim': None}),
+]
+
+
+# Tests related to the IMGIX_SIGNER option
+class SignerTests(TestCase):
+
+
+    def test_prefix_signer_matches_upstream_signatures(self):
+
+        for key in ['1234test', 'jUIrLPuMEm2aCRj', 'kéy']:
+            for domains in ['test1.imgix.net', ['test1.imgix.net', 'test2.imgix.net']]:
+                upstream = imgix.UrlBuilder(domains, sign_key=key)
+                unsigned = imgix.UrlBuilder(domains)
+                signer = PrefixSigner(key)
+                for path, params in SIGNING_CORPUS:
+                    self.assertEqual(
+                        signer.sign_url(unsigned.create_url(path, params)),
+                        upstream.create_url(path, params)
+                    )
+
+
+    def test_signer_setting(self):
+
+        domains = 'test1.imgix.net'
+        key = '1234test'
+
+        with self.settings(IMGIX_DOMAINS=domains,
+                           IMGIX_SIGN_KEY=key,
+                           IMGIX_SIGNER='django_imgix.signing.PrefixSigner'):
+            self.assertIsInstance(get_config().signer, PrefixSigner)
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% get_imgix 'media/image/image_0001.jpg' %}"
+            )
+            self.assertEqual(
+                rendered,
+                "https://test1.imgix.net/media/image/image_0001.jpg?ixlib=python-{0}&s=69cce16d20a22e7bd5dbb53a2c276827".format(__version__)
+            )
+
+
+    def test_signer_is_not_used_without_sign_key(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIGNER='django_imgix.signing.PrefixSigner'):
+            self.assertIsNone(get_config().signer)
+
+
+# Tests related to IMGIX_SHARD_STRATEGY and IMGIX_SHARD_WEIGHTS
+class ShardingTests(TestCase):
+
+    domains = [
+        'test1.imgix.net',
+        'test2.imgix.net',
+        'test3.imgix.net',
+    ]
+
+    paths = ['/media/catalogue/product_{0:06d}.jpg'.format(i)
+             for i in range(30000)]
+
+
+    def test_crc_sharding_matches_imgix(self):
+
+        upstream = imgix.UrlBuilder(self.domains)
+
+        with self.settings(IMGIX_DOMAINS=self.domains):
+            for path in self.paths[:200]:
+                self.assertEqual(
+                    get_imgix(path),
+                    upstream.create_url(path, {'ixlib': 'django'})
+                )
+
+
+    def test_path_always_gets_the_same_domain(self):
+
+        first = ShardSelector(self.domains)
+        second = ShardSelector(list(self.domains))
+        for path in self.paths[:200]:
+            self.assertEqual(first.select(path), second.select(path))
+            self.assertEqual(first.select(path), first.select(path))
+
+
+    def test_distribution_is_even(self):
+
+        selector = ShardSelector(self.domains)
+        counts = Counter(selector.select(path) for path in self.paths)
+        expected = len(self.paths) / 3.0
+        for domain in self.domains:
+            self.assertAlmostEqual(counts[domain] / expected, 1, delta=0.05)
+
+
+    def test_distribution_follows_weights(self):
+
+        selector = ShardSelector(
+            self.domains, {'test1.imgix.net': 4, 'test2.imgix.net': 2})
+        counts = Counter(selector.select(path) for path in self.paths)
+        expected = len(self.paths) / 7.0
+        self.assertAlmostEqual(
+            counts['test1.imgix.net'] / expected, 4, delta=0.2)
+        self.assertAlmostEqual(
+            counts['test2.imgix.net'] / expected, 2, delta=0.1)
+        self.assertAlmostEqual(
+            counts['test3.imgix.net'] / expected, 1, delta=0.05)
+
+
+    def test_invalid_weights_give_useful_error(self):
+
+        for weights in [[1, 2, 3], {'test1.imgix.net': 0},
+                        {'test1.imgix.net': 1.5}]:
+            with self.settings(IMGIX_DOMAINS=self.domains,
+                               IMGIX_SHARD_WEIGHTS=weights):
+                self.assertRaises(ImproperlyConfigured, get_config)
+
+
+    def test_weights_are_part_of_the_fingerprint(self):
+
+        with self.settings(IMGIX_DOMAINS=self.domains):
+            unweighted = get_config().fingerprint
+        with self.settings(IMGIX_DOMAINS=self.domains,
+                           IMGIX_SHARD_WEIGHTS={'test1.imgix.net': 2}):
+            weighted = get_config().fingerprint
+        self.assertNotEqual(unweighted, weighted)
+
+
+    def test_cycle_strategy_continues_across_calls(self):
+
+        with self.settings(IMGIX_DOMAINS=self.domains,
+                           IMGIX_SHARD_STRATEGY='cycle'):
+            urls = [get_imgix('media/image/image_0001.jpg') for _ in range(6)]
+            hosts = [url.split('/')[2] for url in urls]
+            self.assertEqual(hosts, self.domains + self.domains)
+
+
+    def test_unknown_strategy_gives_useful_error(self):
+
+        with self.settings(IMGIX_DOMAINS=self.domains,
+                           IMGIX_SHARD_STRATEGY='random'):
+            with self.assertRaises(ImproperlyConfigured) as cm:
+                get_config()
+            self.assertEqual(
+                str(cm.exception),
+                "IMGIX_SHARD_STRATEGY must be 'crc' or 'cycle'"
+            )
+
+
+class Product(models.Model):
+    id = models.AutoField(primary_key=True)
+    image = ImgixFileField(
+        upload_to='products',
+        blank=True,
+        imgix_aliases=['alias_one', 'alias_two'],
+        imgix_urls_field='image_imgix_urls',
+    )
+    image_imgix_urls = models.TextField(blank=True, editable=False)
+    document = ImgixFileField(upload_to='documents', blank=True)
+
+    class Meta:
+        app_label = 'django_imgix'
+
+
+# Tests related to the ImgixFileField and ImgixImageField model fields
+class ModelFieldTests(TestCase):
+
+    aliases = {
+        'alias_one': {'w': 150, 'h': 350, 'auto': 'format'},
+        'alias_two': {'w': 50},
+    }
+
+
+    def test_urls_are_built_for_aliases(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            product = Product(image='products/image_0001.jpg')
+            self.assertEqual(
+                product.image.imgix_urls,
+                {
+                    'alias_one': "https://test1.imgix.net/media/products/image_0001.jpg?auto=format&h=350&ixlib=python-{0}&w=150".format(__version__),
+                    'alias_two': "https://test1.imgix.net/media/products/image_0001.jpg?ixlib=python-{0}&w=50".format(__version__),
+                }
+            )
+            self.assertEqual(
+                product.image.imgix('alias_two'),
+                get_imgix('/media/products/image_0001.jpg', 'alias_two')
+            )
+            self.assertEqual(
+                product.image.imgix(w=10),
+                get_imgix('/media/products/image_0001.jpg', w=10)
+            )
+
+
+    def test_urls_are_memoized_per_instance(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            product = Product(image='products/image_0001.jpg')
+            urls = product.image.imgix_urls
+            self.assertIs(product.image.imgix_urls, urls)
+
+            product.image = 'products/image_0002.jpg'
+            self.assertIn('image_0002.jpg', product.image.imgix_urls['alias_one'])
+
+        with self.settings(IMGIX_DOMAINS='test2.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            self.assertIn('test2.imgix.net', product.image.imgix_urls['alias_one'])
+
+
+    def test_urls_are_stored_on_save(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            product = Product.objects.create(image='products/image_0001.jpg')
+            stored = json.loads(product.image_imgix_urls)
+            self.assertEqual(stored['name'], 'products/image_0001.jpg')
+            self.assertEqual(stored['urls'], product.image.imgix_urls)
+
+            product = Product.objects.get(pk=product.pk)
+            with mock.patch('django_imgix.models.build_imgix_url') as build:
+                self.assertEqual(product.image.imgix_urls, stored['urls'])
+                self.assertFalse(build.called)
+
+
+    def test_stale_stored_urls_are_ignored(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            product = Product.objects.create(image='products/image_0001.jpg')
+
+        with self.settings(IMGIX_DOMAINS='test2.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            product = Product.objects.get(pk=product.pk)
+            self.assertIn('test2.imgix.net', product.image.imgix_urls['alias_one'])
+
+        # Changing an alias (or a setting the URLs depend on) also makes them
+        # stale, both stored and kept on the file
+        aliases = dict(self.aliases, alias_one={'w': 999})
+        for options in [{'IMGIX_ALIASES': aliases},
+                        {'IMGIX_ALIASES': self.aliases,
+                         'IMGIX_DETECT_FORMAT': True},
+                        {'IMGIX_ALIASES': self.aliases,
+                         'IMGIX_WEB_PROXY_SOURCE': True},
+                        {'IMGIX_ALIASES': self.aliases,
+                         'IMGIX_SIZE_BUCKETS': {'w': [1000]}}]:
+            with self.settings(IMGIX_DOMAINS='test1.imgix.net', **options):
+                expected = build_imgix_url(product.image.url, 'alias_one')
+                self.assertEqual(product.image.imgix_urls['alias_one'], expected)
+                product = Product.objects.get(pk=product.pk)
+                self.assertEqual(product.image.imgix_urls['alias_one'], expected)
+
+
+    def test_empty_file_has_no_urls(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES=self.aliases):
+            product = Product.objects.create()
+            self.assertEqual(product.image.imgix_urls, {})
+            self.assertEqual(product.image_imgix_urls, '')
+            self.assertEqual(product.document.imgix_urls, {})
+
+
+    def test_deconstruct(self):
+
+        name, path, args, kwargs = Product._meta.get_field('image').deconstruct()
+        self.assertEqual(path, 'django_imgix.models.ImgixFileField')
+        self.assertEqual(kwargs['imgix_aliases'], ['alias_one', 'alias_two'])
+        self.assertEqual(kwargs['imgix_urls_field'], 'image_imgix_urls')
+
+
+class LazyURLTests(TestCase):
+
+
+    def test_url_is_built_when_output(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIGN_KEY='1234test'):
+            expected = build_imgix_url('/media/image/image_0001.jpg', w=100)
+            with mock.patch.object(get_config(), 'create_url',
+                                   wraps=get_config().create_url) as create:
+                url = imgix_url('/media/image/image_0001.jpg', w=100)
+                self.assertIsInstance(url, ImgixURL)
+                self.assertFalse(create.called)
+
+                self.assertEqual(str(url), expected)
+                self.assertEqual(str(url), url.__html__())
+                self.assertEqual(create.call_count, 1)
+
+
+    def test_with_params(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150, 'h': 350}}):
+            url = imgix_url('media/image/image_0001.jpg', 'alias_one')
+            larger = url.with_params(w=300, h=None)
+
+            self.assertEqual(dict(url.params)['w'], 150)
+            self.assertEqual(
+                str(larger),
+                build_imgix_url('media/image/image_0001.jpg', w=300)
+            )
+            self.assertEqual(
+                larger, imgix_url('media/image/image_0001.jpg', w=300)
+            )
+            self.assertNotEqual(url, larger)
+
+
+    def test_arguments_are_checked_immediately(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            with self.assertRaises(ImproperlyConfigured):
+                imgix_url('media/image/image_0001.jpg', 'alias_one')
+
+
+    def test_assignment_tag(self):
+
+        template = (
+            "{% load imgix_tags %}"
+            "{% get_imgix path w=100 as url %}"
+            "{% if show %}<img src=\"{{ url }}\"/>{% endif %}"
+        )
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            with mock.patch.object(get_config(), 'create_url',
+                                   wraps=get_config().create_url) as create:
+                rendered = render_template(
+                    template, {'path': 'media/image/image_0001.jpg'})
+                self.assertEqual(rendered, '')
+                self.assertFalse(create.called)
+
+            rendered = render_template(
+                template,
+                {'path': 'media/image/image_0&1.jpg', 'show': True}
+            )
+            self.assertEqual(
+                rendered,
+                '<img src="{0}"/>'.format(
+                    build_imgix_url('media/image/image_0&1.jpg', w=100))
+            )
+
+
+    def test_assignment_tag_in_batch(self):
+
+        template = (
+            "{% load imgix_tags %}{% imgix_batch %}"
+            "{% get_imgix path 'alias_one' as url %}{{ url }}"
+            "{% end_imgix_batch %}"
+        )
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            self.assertEqual(
+                render_template(template, {'path': 'media/image.jpg'}),
+                build_imgix_url('media/image.jpg', 'alias_one')
+            )
+
+
+    def test_tag_arguments_are_checked(self):
+
+        for template in (
+            "{% load imgix_tags %}{% get_imgix %}",
+            "{% load imgix_tags %}{% get_imgix w=100 'path' %}",
+            "{% load imgix_tags %}{% get_imgix 'a' 'b' 'c' 'd' %}",
+        ):
+            with self.assertRaises(TemplateSyntaxError):
+                Template(template)
+
+
+metrics_calls = []
+
+
+def record_metrics(request, metrics):
+    metrics_calls.append((request, metrics))
+
+
+class MetricsTests(TestCase):
+
+    def get_response(self, request):
+        for path in ('media/image_1.jpg', 'media/image_2.jpg',
+                     'media/image_1.jpg'):
+            build_imgix_url(path, w=100)
+        response = HttpResponse('')
+        response['Server-Timing'] = 'db;dur=1.5'
+        return response
+
+    def request(self):
+        middleware = ImgixMetricsMiddleware(self.get_response)
+        return middleware(RequestFactory().get('/'))
+
+
+    def test_disabled(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            self.assertNotIn('create_url', vars(get_config()))
+            response = self.request()
+            self.assertEqual(response['Server-Timing'], 'db;dur=1.5')
+
+
+    def test_server_timing(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_URL_CACHE_SIZE=10,
+                           IMGIX_METRICS=True):
+            response = self.request()
+            timing = response['Server-Timing']
+            self.assertTrue(timing.startswith('db;dur=1.5, imgix;dur='))
+            self.assertIn('desc="3 URLs"', timing)
+            self.assertIn('desc="2 built"', timing)
+            self.assertIn('imgix-cache;desc="33% hits"', timing)
+            self.assertNotIn('imgix-sign', timing)
+
+            # Nothing is recorded outside of a request
+            build_imgix_url('media/image_3.jpg')
+            self.assertEqual(get_config().url_cache.info()['misses'], 3)
+
+
+    def test_signing_time_and_callback(self):
+
+        del metrics_calls[:]
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIGN_KEY='1234test',
+                           IMGIX_SIGNER='django_imgix.signing.PrefixSigner',
+                           IMGIX_METRICS=True,
+                           IMGIX_METRICS_CALLBACK='django_imgix.tests.tests.record_metrics'):
+            response = self.request()
+            self.assertIn('imgix-sign;dur=', response['Server-Timing'])
+
+            request, metrics = metrics_calls[0]
+            self.assertEqual(request.path, '/')
+            self.assertEqual(
+                (metrics.urls, metrics.built, metrics.cache_hits), (3, 3, 0))
+            self.assertGreater(metrics.sign_time, 0)
+            self.assertGreaterEqual(metrics.time, metrics.build_time)
+
+
+class StubPanel(object):
+    """
+    The parts of debug_toolbar.panels.Panel used by ImgixPanel, for when
+    django-debug-toolbar isn't installed.
+    """
+
+    def __init__(self, toolbar, get_response):
+        self.toolbar = toolbar
+        self.get_response = get_response
+
+    @property
+    def panel_id(self):
+        return self.__class__.__name__
+
+    def process_request(self, request):
+        return self.get_response(request)
+
+    def record_stats(self, stats):
+        self.toolbar.stats.setdefault(self.panel_id, {}).update(stats)
+
+    def get_stats(self):
+        return self.toolbar.stats.get(self.panel_id, {})
+
+
+# Tests related to the django-debug-toolbar panel
+class PanelTests(TestCase):
+
+    def setUp(self):
+        try:
+            from django_imgix.panels import ImgixPanel
+        except ImportError:
+            toolbar = ModuleType('debug_toolbar')
+            toolbar.panels = ModuleType('debug_toolbar.panels')
+            toolbar.panels.Panel = StubPanel
+            with mock.patch.dict(sys.modules, {
+                'debug_toolbar': toolbar,
+                'debug_toolbar.panels': toolbar.panels,
+            }):
+                from django_imgix.panels import ImgixPanel
+        self.ImgixPanel = ImgixPanel
+
+    def get_response(self, request):
+        for path in ('media/image_1.jpg', 'media/image_2.jpg',
+                     'media/image_1.jpg'):
+            build_imgix_url(path, w=100)
+        return HttpResponse('')
+
+    def request(self, get_response):
+        panel = self.ImgixPanel(mock.Mock(stats={}), get_response)
+        panel.process_request(RequestFactory().get('/'))
+        return panel
+
+
+    def test_panel(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_URL_CACHE_SIZE=10,
+                           IMGIX_METRICS=True):
+            panel = self.request(self.get_response)
+            stats = panel.get_stats()
+            self.assertEqual(
+                (stats['urls'], stats['built'], stats['cache_hits']),
+                (3, 2, 1))
+            self.assertTrue(panel.nav_subtitle.startswith('3 URLs in '))
+            self.assertIn('<th>Cache hit ratio</th><td>33%</td>',
+                          panel.content)
+            self.assertIsNone(get_current_metrics())
+
+
+    def test_disabled(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            panel = self.request(self.get_response)
+            self.assertEqual(panel.get_stats(), {})
+            self.assertEqual(panel.nav_subtitle, '')
+            self.assertIn('IMGIX_METRICS is not enabled', panel.content)
+
+
+    def test_panel_shares_middleware_metrics(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_METRICS=True):
+            # ImgixMetricsMiddleware before the toolbar
+            panels = []
+
+            def toolbar(request):
+                panels.append(self.request(self.get_response))
+                return HttpResponse('')
+
+            response = ImgixMetricsMiddleware(toolbar)(
+                RequestFactory().get('/'))
+            self.assertIn('desc="3 URLs"', response['Server-Timing'])
+            self.assertEqual(panels[0].get_stats()['urls'], 3)
+
+            # ImgixMetricsMiddleware after the toolbar
+            responses = []
+
+            def middleware(request):
+                responses.append(
+                    ImgixMetricsMiddleware(self.get_response)(request))
+                return responses[0]
+
+            panel = self.request(middleware)
+            self.assertIn('desc="3 URLs"', responses[0]['Server-Timing'])
+            self.assertEqual(panel.get_stats()['urls'], 3)
+            self.assertIsNone(get_current_metrics())
+
+
+# Tests related to the imgix_warm management command
+class WarmCommandTests(TestCase):
+
+    aliases = {
+        'alias_one': {'w': 150, 'h': 350, 'auto': 'format'},
+        'alias_two': {'w': 50},
+    }
+    paths = ['/media/products/image_{0:04d}.jpg'.format(i) for i in range(5)]
+
+    def settings(self, **kwargs):
+        options = {
+            'CACHES': SHARED_CACHES,
+            'IMGIX_DOMAINS': 'test1.imgix.net',
+            'IMGIX_CACHE': 'imgix',
+            'IMGIX_ALIASES': self.aliases,
+        }
+        options.update(kwargs)
+        return super(WarmCommandTests, self).settings(**options)
+
+    def setUp(self):
+        Product.objects.bulk_create(
+            [Product(image=path[len('/media/'):]) for path in self.paths] +
+            [Product()]
+        )
+
+    def warm(self, *args, **kwargs):
+        out = StringIO()
+        call_command('imgix_warm', *args, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def assertWarmed(self, aliases):
+        with self.settings(IMGIX_CACHE=None):
+            expected = [build_imgix_url(path, alias)
+                        for alias in aliases for path in self.paths]
+        with mock.patch.object(get_config(), 'build_url') as build_url:
+            urls = [build_imgix_url(path, alias)
+                    for alias in aliases for path in self.paths]
+            self.assertFalse(build_url.called)
+        self.assertEqual(urls, expected)
+
+
+    def test_warm_model_fields(self):
+
+        with self.settings():
+            get_cache('imgix').clear()
+            get_cache('imgix').calls = []
+            output = self.warm('django_imgix.Product', chunk_size=2)
+            self.assertIn(
+                'django_imgix.Product.image: 10 URLs warmed, 10 built', output)
+            self.assertEqual(Counter(get_cache('imgix').calls),
+                             {'get_many': 3, 'set_many': 3})
+            self.assertWarmed(['alias_one', 'alias_two'])
+
+            # URLs that are already cached aren't built again
+            output = self.warm()
+            self.assertIn(
+                'django_imgix.Product.image: 10 URLs warmed, 0 built', output)
+
+
+    @skipIf(iter_imgix_urls_parallel is None,
+            "concurrent.futures is not available")
+    def test_warm_paths_in_processes(self):
+
+        with self.settings():
+            get_cache('imgix').clear()
+            with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                             delete=False) as paths:
+                paths.write('\n'.join(self.paths) + '\n\n')
+            pool = 'django_imgix.management.commands.imgix_warm.' \
+                   'ProcessPoolExecutor'
+            try:
+                with mock.patch(pool, wraps=ProcessPoolExecutor) as executor:
+                    output = self.warm(paths=paths.name,
+                                       aliases=['alias_two'], processes=2)
+            finally:
+                os.remove(paths.name)
+            self.assertIn('5 URLs warmed, 5 built', output)
+            self.assertWarmed(['alias_two'])
+
+            # The workers get the configuration of this process
+            self.assertEqual(executor.call_args[1]['initargs'],
+                             (get_worker_options(),))
+
+
+    def test_dry_run(self):
+
+        with self.settings(IMGIX_CACHE=None):
+            output = self.warm('django_imgix.Product.image',
+                               aliases=['alias_one'], dry_run=True)
+            self.assertIn(
+                'django_imgix.Product.image: 5 URLs would be warmed', output)
+
+
+    def test_errors(self):
+
+        with self.settings(IMGIX_CACHE=None):
+            with self.assertRaises(CommandError):
+                self.warm()
+        with self.settings():
+            for args, kwargs in (
+                (('django_imgix',), {}),
+                (('django_imgix.Unknown',), {}),
+                (('django_imgix.Product.unknown',), {}),
+                (('django_imgix.Product.image_imgix_urls',),
+                 {'aliases': ['alias_one']}),
+                ((), {'paths': 'paths.txt'}),
+            ):
+                with self.assertRaises(CommandError):
+                    self.warm(*args, **kwargs)
+
+
+# Tests related to the async API
+@skipIf(async_to_sync is None, "asgiref is not installed")
+class AsyncTests(TestCase):
+
+    paths = ['media/image/image_{0:04d}.jpg'.format(i) for i in range(20)]
+
+
+    def test_abuild_imgix_url(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIGN_KEY='1234test',
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            self.assertEqual(
+                async_to_sync(abuild_imgix_url)(
+                    'media/image/image_0001.jpg', 'alias_one'),
+                build_imgix_url('media/image/image_0001.jpg', 'alias_one')
+            )
+            self.assertEqual(
+                async_to_sync(abuild_imgix_urls)(self.paths, wh='300x200'),
+                build_imgix_urls(self.paths, wh='300x200')
+            )
+
+
+    def test_shared_cache(self):
+
+        with self.settings(CACHES=SHARED_CACHES,
+                           IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_CACHE='imgix'):
+            cache = get_cache('imgix')
+            cache.clear()
+            cache.calls = []
+            urls = async_to_sync(abuild_imgix_urls)(self.paths, w=100)
+            self.assertEqual(cache.calls, ['get_many', 'set_many'])
+
+            cache.calls = []
+            self.assertEqual(
+                async_to_sync(abuild_imgix_urls)(self.paths, w=100), urls)
+            self.assertEqual(cache.calls, ['get_many'])
+
+            with self.settings(IMGIX_CACHE=None):
+                self.assertEqual(build_imgix_urls(self.paths, w=100), urls)
+
+
+    def test_large_batches_are_built_in_a_thread(self):
+
+        import asyncio
+
+        in_event_loop = []
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            config = get_config()
+            build_url = config.build_url
+
+            def record_thread(path, arguments):
+                try:
+                    asyncio.get_running_loop()
+                    in_event_loop.append(True)
+                except RuntimeError:
+                    in_event_loop.append(False)
+                return build_url(path, arguments)
+
+            with mock.patch.object(config, 'build_url', record_thread):
+                async_to_sync(abuild_imgix_urls)(self.paths[:2])
+                self.assertEqual(in_event_loop, [True, True])
+
+                del in_event_loop[:]
+                with mock.patch('django_imgix.aio.OFFLOAD_THRESHOLD', 5):
+                    async_to_sync(abuild_imgix_urls)(self.paths)
+                self.assertEqual(in_event_loop, [False] * len(self.paths))
+
+
+    def test_metrics(self):
+
+        def abuild(paths, **kwargs):
+            metrics = start_metrics()
+            try:
+                async_to_sync(abuild_imgix_urls)(paths, **kwargs)
+            finally:
+                stop_metrics()
+            return (metrics.urls, metrics.built)
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_METRICS=True):
+            self.assertEqual(abuild(self.paths[:2]), (2, 2))
+            # Built in a worker thread
+            with mock.patch('django_imgix.aio.OFFLOAD_THRESHOLD', 5):
+                self.assertEqual(abuild(self.paths), (20, 20))
+
+        with self.settings(CACHES=SHARED_CACHES,
+                           IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_CACHE='imgix',
+                           IMGIX_METRICS=True):
+            get_cache('imgix').clear()
+            self.assertEqual(abuild(self.paths, w=100), (20, 20))
+            self.assertEqual(abuild(self.paths, w=100), (20, 0))
+
+
+# Tests related to building URLs in a process pool
+@skipIf(iter_imgix_urls_parallel is None, "concurrent.futures is not available")
+class ParallelTests(TestCase):
+
+    paths = ['media/image/image_{0:04d}.jpg'.format(i) for i in range(50)]
+
+
+    def test_same_urls_in_order(self):
+
+        with self.settings(IMGIX_DOMAINS=['test1.imgix.net',
+                                          'test2.imgix.net'],
+                           IMGIX_SIGN_KEY='1234test',
+                           IMGIX_SIGNER='django_imgix.signing.PrefixSigner',
+                           IMGIX_DETECT_FORMAT=True,
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            self.assertEqual(
+                list(iter_imgix_urls_parallel(
+                    self.paths, 'alias_one', processes=2, chunk_size=7)),
+                build_imgix_urls(self.paths, 'alias_one')
+            )
+
+
+    def test_errors_are_raised_immediately(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            with self.assertRaises(ImproperlyConfigured):
+                iter_imgix_urls_parallel(self.paths, 'alias_one')
+
+
+    def test_stop_early(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            urls = iter_imgix_urls_parallel(iter(self.paths), w=100,
+                                            processes=2, chunk_size=5)
+            self.assertEqual(next(urls), build_imgix_url(self.paths[0], w=100))
+            urls.close()
+
+
+class ProductSitemap(ImgixImageSitemap):
+    imgix_alias = 'alias_one'
+    chunk_size = 2
+
+    def items(self):
+        return Product.objects.order_by('pk')
+
+    def location(self, product):
+        return '/products/{0}/'.format(product.pk)
+
+    def images(self, product):
+        if product.image:
+            return [product.image.url, product.image.url + '?v=2']
+        return []
+
+
+# Tests related to the image sitemaps
+class SitemapTests(TestCase):
+
+    namespaces = {
+        'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9',
+        'image': 'http://www.google.com/schemas/sitemap-image/1.1',
+    }
+
+    def setUp(self):
+        Product.objects.bulk_create(
+            [Product(image='products/image_{0:04d}.jpg'.format(i))
+             for i in range(5)] + [Product()]
+        )
+
+    def assertSitemap(self, xml):
+        root = ElementTree.fromstring(xml)
+        urls = root.findall('sitemap:url', self.namespaces)
+        products = list(Product.objects.order_by('pk'))
+        self.assertEqual(len(urls), len(products))
+        for url, product in zip(urls, products):
+            self.assertEqual(
+                url.find('sitemap:loc', self.namespaces).text,
+                'http://example.com/products/{0}/'.format(product.pk)
+            )
+            images = [
+                image.text for image in
+                url.findall('image:image/image:loc', self.namespaces)
+            ]
+            expected = []
+            if product.image:
+                expected = [
+                    build_imgix_url(product.image.url, 'alias_one'),
+                    build_imgix_url(product.image.url + '?v=2', 'alias_one'),
+                ]
+            self.assertEqual(images, expected)
+
+
+    def test_write_sitemap(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150, 'h': 50}}):
+            output = StringIO()
+            write_sitemap(output, {'products': ProductSitemap})
+            self.assertIn('&amp;', output.getvalue())
+            self.assertSitemap(output.getvalue())
+
+
+    def test_streaming_view(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            request = RequestFactory().get('/sitemap.xml')
+            response = sitemap(request, {'products': ProductSitemap})
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/xml')
+            self.assertSitemap(b''.join(response.streaming_content))
+
+            for page in ('2', 'x'):
+                with self.assertRaises(Http404):
+                    sitemap(RequestFactory().get('/sitemap.xml', {'p': page}),
+                            {'products': ProductSitemap})
+            with self.assertRaises(Http404):
+                sitemap(request, {'products': ProductSitemap}, 'other')
+
+
+    def test_get_urls(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            urls = ProductSitemap().get_urls()
+            self.assertEqual([len(url['images']) for url in urls],
+                             [2, 2, 2, 2, 2, 0])
+
+
+    def test_get_urls_without_django_3_2_helpers(self):
+
+        # Django 3.1's Sitemap doesn't have these
+        helpers = ('get_protocol', 'get_domain', '_get', '_location')
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            expected = ProductSitemap().get_urls()
+            patchers = [mock.patch.object(Sitemap, name,
+                                          side_effect=AssertionError)
+                        for name in helpers]
+            for patcher in patchers:
+                patcher.start()
+            try:
+                self.assertEqual(ProductSitemap().get_urls(), expected)
+                self.assertEqual(
+                    ProductSitemap().get_urls(site=Site(domain='b.com'),
+                                              protocol='https')[0]['location'],
+                    'https://b.com/products/{0}/'.format(
+                        Product.objects.order_by('pk')[0].pk)
+                )
+            finally:
+                for patcher in patchers:
+                    patcher.stop()
+
+
+# Tests related to the IMGIX_NORMALIZE option
+class NormalizeTests(TestCase):
+
+
+    def test_normalize_params(self):
+
+        self.assertEqual(
+            normalize_params({
+                'w': '250', 'h': 100.0, 'q': '70.0', 'dpr': 1.5,
+                'auto': 'format, compress,format', 'ch': 'Width,DPR',
+                'fit': 'crop', 'txt': '250', 'rect': '0,0,100,100',
+            }),
+            {
+                'w': 250, 'h': 100, 'q': 70, 'dpr': 1.5,
+                'auto': 'compress,format', 'ch': 'DPR,Width',
+                'fit': 'crop', 'txt': '250', 'rect': '0,0,100,100',
+            }
+        )
+        self.assertEqual(
+            normalize_params({'w': 100, 'dpr': '1', 'q': 75.0, 'fit': 'clip',
+                              'rot': 0}),
+            {'w': 100}
+        )
+        self.assertEqual(normalize_params({'w': 'auto'}), {'w': 'auto'})
+
+
+    def test_default_quality_is_kept_with_compress(self):
+
+        # imgix uses a lower quality with auto=compress unless q is set
+        self.assertEqual(
+            normalize_params({'auto': 'format, compress', 'q': 75.0}),
+            {'auto': 'compress,format', 'q': 75}
+        )
+        self.assertEqual(
+            normalize_params({'auto': 'format', 'q': 75}), {'auto': 'format'})
+
+
+    def test_empty_values(self):
+
+        self.assertEqual(
+            normalize_params({'w': 100, 'auto': '', 'fit': '', 'q': '',
+                              'txt': '', 'mark': ''}),
+            {'w': 100, 'txt': '', 'mark': ''}
+        )
+
+
+    def test_variants_share_one_url(self):
+
+        template = "{% load imgix_tags %}{% get_imgix 'media/image.jpg' " \
+                   "w=w q=q auto=auto dpr=dpr %}"
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_NORMALIZE=True):
+            urls = set(
+                render_template(template, context) for context in (
+                    {'w': 250, 'q': 70, 'auto': 'compress,format', 'dpr': 1},
+                    {'w': '250', 'q': 70.0, 'auto': 'format,compress'},
+                    {'w': 250.0, 'q': '70', 'auto': 'format, compress',
+                     'dpr': '1.0'},
+                )
+            )
+            self.assertEqual(
+                urls,
+                {"https://test1.imgix.net/media/image.jpg?auto=compress%2Cformat&ixlib=python-{0}&q=70&w=250".format(__version__)}
+            )
+            self.assertEqual(
+                render_template(
+                    "{% load imgix_tags %}{% get_imgix 'image.jpg' wh='250x0' %}"),
+                build_imgix_url('image.jpg', w='250')
+            )
+
+
+    def test_off_by_default(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            self.assertEqual(
+                build_imgix_url('image.jpg', w='250', q=75),
+                "https://test1.imgix.net/image.jpg?ixlib=python-{0}&q=75&w=250".format(__version__)
+            )
+
+
+    def test_aliases(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_NORMALIZE=True,
+                           IMGIX_ALIASES={'alias_one': {'w': '150',
+                                                        'dpr': 1}}):
+            self.assertEqual(
+                get_config().aliases['alias_one'].params, (('w', 150),))
+
+
+    def test_strict(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_NORMALIZE='strict',
+                           IMGIX_ALIASES={'alias_one': {'q': 75}}):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                get_config()
+                build_imgix_url('image.jpg', w='250')
+                build_imgix_url('image.jpg', w=250)
+
+            self.assertEqual(
+                [str(warning.message) for warning in caught],
+                [
+                    "Alias alias_one in IMGIX_ALIASES: q=75 is the default "
+                    "and can be omitted",
+                    "get_imgix: w='250' is not canonical, use w=250",
+                ]
+            )
+            self.assertTrue(all(
+                warning.category is NonCanonicalParameterWarning
+                for warning in caught
+            ))
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_NORMALIZE='yes'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_config()
+
+
+# Tests related to the IMGIX_SIZE_BUCKETS option
+class SizeBucketTests(TestCase):
+
+    buckets = {
+        'w': [320, 640, 1280],
+        'dpr': [1, 2, 3],
+    }
+
+
+    def test_apply(self):
+
+        buckets = SizeBuckets(self.buckets)
+        self.assertEqual(buckets.apply({'w': 347}), {'w': 640})
+        self.assertEqual(buckets.apply({'w': '320'}), {'w': 320})
+        self.assertEqual(buckets.apply({'w': 347, 'h': 200, 'fit': 'crop'}),
+                         {'w': 640, 'h': 369, 'fit': 'crop'})
+        self.assertEqual(buckets.apply({'w': 1500, 'dpr': 1.5}),
+                         {'w': 1500, 'dpr': 2})
+        self.assertEqual(buckets.apply({'w': 0.5, 'h': 100}),
+                         {'w': 0.5, 'h': 100})
+
+        buckets = SizeBuckets({'h': [100, 200]})
+        self.assertEqual(buckets.apply({'w': 300, 'h': 150}),
+                         {'w': 400, 'h': 200})
+
+
+    def test_tags_and_aliases(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_SIZE_BUCKETS=self.buckets,
+                           IMGIX_ALIASES={'alias_one': {'w': 600, 'h': 300}}):
+            self.assertEqual(
+                render_template(
+                    "{% load imgix_tags %}{% get_imgix 'image.jpg' wh='1233x0' %}"),
+                "https://test1.imgix.net/image.jpg?ixlib=python-{0}&w=1280".format(__version__)
+            )
+            self.assertEqual(
+                build_imgix_url('image.jpg', 'alias_one'),
+                "https://test1.imgix.net/image.jpg?h=320&ixlib=python-{0}&w=640".format(__version__)
+            )
+            for w in (330, 400, 500, 640):
+                build_imgix_url('image.jpg', w=w)
+
+            self.assertEqual(
+                size_bucket_info(),
+                {'sizes': 6, 'variants': 3, 'collapsed': 3}
+            )
+
+
+    def test_invalid(self):
+
+        for buckets in ([320], {'q': [75]}, {'w': []}, {'w': ['wide']}):
+            with self.assertRaises(ImproperlyConfigured):
+                SizeBuckets(buckets)
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            self.assertIsNone(size_bucket_info())
+
+
+# Tests related to the folding of literal get_imgix tags
+class LiteralFoldingTests(TestCase):
+
+
+    def test_literal_tag_is_built_once(self):
+
+        template = Template(
+            "{% load imgix_tags %}"
+            "{% get_imgix 'media/logo.png' 'alias_one' %} "
+            "{% get_imgix 'media/logo.png' w=100 h=50.5 %}"
+        )
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_ALIASES={'alias_one': {'w': 150}}):
+            expected = '{0} {1}'.format(
+                build_imgix_url('media/logo.png', 'alias_one'),
+                build_imgix_url('media/logo.png', w=100, h=50.5),
+            )
+            with mock.patch.object(get_config(), 'create_url',
+                                   wraps=get_config().create_url) as create:
+                for _ in range(3):
+                    self.assertEqual(template.render(Context()), expected)
+                self.assertEqual(create.call_count, 2)
+
+            # Changing a setting invalidates the folded URLs
+            with self.settings(IMGIX_ALIASES={'alias_one': {'w': 300}}):
+                self.assertEqual(
+                    template.render(Context()).split(' ')[0],
+                    build_imgix_url('media/logo.png', 'alias_one')
+                )
+            self.assertEqual(template.render(Context()), expected)
+
+
+    def test_folded_tags_are_counted_in_metrics(self):
+
+        template = Template(
+            "{% load imgix_tags %}{% get_imgix 'media/logo.png' w=100 %}")
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_METRICS=True):
+            metrics = start_metrics()
+            try:
+                for _ in range(3):
+                    template.render(Context())
+            finally:
+                stop_metrics()
+            self.assertEqual((metrics.urls, metrics.built), (3, 1))
+
+
+    def test_variable_tags_are_not_folded(self):
+
+        template = Template(
+            "{% load imgix_tags %}"
+            "{% get_imgix path %} {% get_imgix 'logo.png' w=w %} "
+            "{% get_imgix 'logo.png'|lower %}{% get_imgix 'logo.png' as url %}"
+        )
+        self.assertEqual(
+            [node.literal for node in template.nodelist
+             if hasattr(node, 'literal')],
+            [False, False, False, False]
+        )
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            first = template.render(Context({'path': 'a.png', 'w': 100}))
+            second = template.render(Context({'path': 'b.png', 'w': 200}))
+            self.assertEqual(
+                second,
+                '{0} {1} {2}'.format(build_imgix_url('b.png'),
+                                     build_imgix_url('logo.png', w=200),
+                                     build_imgix_url('logo.png'))
+            )
+            self.assertNotEqual(first, second)
+
+
+    def test_cycle_strategy_is_not_folded(self):
+
+        template = Template("{% load imgix_tags %}{% get_imgix 'logo.png' %}")
+        with self.settings(IMGIX_DOMAINS=['test1.imgix.net',
+                                          'test2.imgix.net'],
+                           IMGIX_SHARD_STRATEGY='cycle'):
+            self.assertNotEqual(template.render(Context()),
+                                template.render(Context()))
+
+
+    def test_literal_tag_in_batch(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net'):
+            template = Template(
+                "{% load imgix_tags %}{% imgix_batch %}"
+                "{% get_imgix 'logo.png' w=100 %}{% end_imgix_batch %}"
+            )
+            for _ in range(2):
+                self.assertEqual(template.render(Context()),
+                                 build_imgix_url('logo.png', w=100))
+
+
+ENGINE_CORPUS = SIGNING_CORPUS + [
+    ('', {}),
+    ('/', {'w': 0}),
+    ('image.jpg', {'w': 0.5, 'h': 1e-05, 'dpr': 2.0}),
+    ('/media/100%/image #1+2.jpg', {'rect': '0,0,100,100'}),
+    ('/media/images/ünïcødé/日本.png', {'txt': 'ünïcødé', 'fit': False}),
+    ('/media/images/ünïcødé/other.png', {'txt64': 'ünïcødé'}),
+    ('/httpdocs/café.jpg', {'w': 100}),
+    ('http://example.com/café.jpg', {'blend64': 'FF0000', 'w': 100}),
+    ('https://example.com/a b/(c)*!~\'.jpg', {}),
+    ('/media/image.jpg', {'ixlib': 'django-1.0', 'fm': 'webp'}),
+    ('/media/image.jpg', {'mark-align': 'top,left', 'mark-pad': 10,
+                          'txt-font': 'Avenir Next,Bold'}),
+    ('/media/image.jpg', {'dl': 'imgix.jpg', 'lossless': 1}),
+    # Values that are equal in Python but not in the URL, one after the other
+    ('/media/image.jpg', {'q': 70}),
+    ('/media/image.jpg', {'q': 70.0}),
+    ('/media/image.jpg', {'w': 0}),
+    ('/media/image.jpg', {'w': False}),
+    ('/media/image.jpg', {'w': 1}),
+    ('/media/image.jpg', {'w': True}),
+    ('/media/image.jpg', {'w': 1.0}),
+]
+
+
+# Tests related to the IMGIX_URL_ENGINE option
+class URLEngineTests(TestCase):
+
+
+    def test_native_engine_matches_upstream_urls(self):
+
+        for use_https in [True, False]:
+            for key in [None, '1234test', 'kéy']:
+                upstream = imgix.UrlBuilder('test1.imgix.net',
+                                            use_https=use_https, sign_key=key)
+                native = URLEngine('test1.imgix.net', use_https=use_https,
+                                   sign_key=key)
+                # Twice, the second time from the memoized encodings
+                for _ in range(2):
+                    for path, params in ENGINE_CORPUS:
+                        self.assertEqual(native.create_url(path, params),
+                                         upstream.create_url(path, params))
+
+
+    def test_native_engine_setting(self):
+
+        for extra in [{},
+                      {'IMGIX_SIGN_KEY': '1234test'},
+                      {'IMGIX_SIGN_KEY': '1234test',
+                       'IMGIX_SIGNER': 'django_imgix.signing.PrefixSigner'},
+                      {'IMGIX_DOMAINS': ['test1.imgix.net', 'test2.imgix.net']},
+                      {'IMGIX_WEB_PROXY_SOURCE': True},
+                      {'IMGIX_HTTPS': False}]:
+            options = dict({'IMGIX_DOMAINS': 'test1.imgix.net',
+                            'IMGIX_ALIASES': {'thumb': {'w': 100, 'h': 100}}},
+                           **extra)
+            with self.settings(**options):
+                self.assertEqual(get_config().url_engine, 'imgix')
+                expected = [build_imgix_url(path, 'thumb')
+                            for path, params in ENGINE_CORPUS]
+            with self.settings(IMGIX_URL_ENGINE='native', **options):
+                self.assertIsInstance(get_config().builder, URLEngine)
+                self.assertEqual([build_imgix_url(path, 'thumb')
+                                  for path, params in ENGINE_CORPUS],
+                                 expected)
+
+
+    def test_memoized_query_strings(self):
+
+        native = URLEngine('test1.imgix.net')
+        native.create_url('/a.jpg', {'w': 100})
+        native.create_url('/b.jpg', {'w': 100})
+        native.create_url('/c.jpg', {'w': 200})
+        self.assertEqual(len(native._queries), 2)
+
+
+    def test_invalid_engine(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_URL_ENGINE='fast'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_config()
+
+
+# Tests related to IMGIX_MANIFEST and the imgix_manifest management command
+class ManifestTests(TestCase):
+
+    images = [
+        '/static/logo.png',
+        ('/static/hero.jpg', 'hero'),
+        ('/static/hero.jpg', 'thumb'),
+        ('/static/hero.jpg', 'thumb'),
+    ]
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.filename = os.path.join(directory, 'imgix-manifest.json')
+
+    def settings(self, **kwargs):
+        options = {
+            'IMGIX_DOMAINS': 'test1.imgix.net',
+            'IMGIX_ALIASES': {'hero': {'w': 1200, 'h': 600}, 'thumb': {'w': 100}},
+            'IMGIX_MANIFEST': self.filename,
+            'IMGIX_MANIFEST_IMAGES': self.images,
+        }
+        options.update(kwargs)
+        return super(ManifestTests, self).settings(**options)
+
+    def build_manifest(self, **kwargs):
+        out = StringIO()
+        call_command('imgix_manifest', stdout=out, **kwargs)
+        return out.getvalue()
+
+    def get_urls(self):
+        return [build_imgix_url('/static/logo.png'),
+                build_imgix_url('/static/hero.jpg', 'hero'),
+                build_imgix_url('https://example.com/static/hero.jpg', 'thumb')]
+
+
+    def test_manifest_urls_are_not_built(self):
+
+        with self.settings(IMGIX_MANIFEST=None):
+            expected = self.get_urls()
+        with self.settings():
+            self.assertIn('3 URLs written', self.build_manifest())
+            with mock.patch.object(get_config(), 'build_url') as build_url:
+                self.assertEqual(self.get_urls(), expected)
+                self.assertFalse(build_url.called)
+            self.assertEqual(build_imgix_url('/static/other.png'),
+                             'https://test1.imgix.net/static/other.png?ixlib=python-{0}'.format(__version__))
+
+
+    def test_manifest_with_caches(self):
+
+        with self.settings(IMGIX_MANIFEST=None):
+            expected = self.get_urls()
+        with self.settings(CACHES=SHARED_CACHES, IMGIX_CACHE='imgix',
+                           IMGIX_URL_CACHE_SIZE=100):
+            self.build_manifest()
+            get_cache('imgix').clear()
+            with mock.patch.object(get_config(), 'build_url') as build_url:
+                self.assertEqual(
+                    build_imgix_urls(['/static/hero.jpg'], 'thumb'),
+                    [expected[2]]
+                )
+                self.assertEqual(self.get_urls(), expected)
+                self.assertFalse(build_url.called)
+
+
+    def test_paths_file(self):
+
+        with self.settings(IMGIX_MANIFEST_IMAGES=None):
+            paths = os.path.join(os.path.dirname(self.filename), 'paths.txt')
+            with open(paths, 'w') as lines:
+                lines.write('/media/a.jpg\n\n/media/b.jpg\n')
+            output = self.build_manifest(paths=paths,
+                                         aliases=['hero', 'thumb'])
+            self.assertIn('4 URLs written', output)
+            with mock.patch.object(get_config(), 'build_url') as build_url:
+                build_imgix_url('/media/b.jpg', 'thumb')
+                self.assertFalse(build_url.called)
+
+
+    def test_manifest_keys_include_value_types(self):
+
+        aliases = {'q70': {'q': 70}, 'w1': {'w': 1}}
+        with self.settings(IMGIX_ALIASES=aliases,
+                           IMGIX_MANIFEST_IMAGES=[('/media/a.jpg', 'q70'),
+                                                  ('/media/a.jpg', 'w1')]):
+            self.build_manifest()
+            self.assertTrue(
+                build_imgix_url('/media/a.jpg', 'q70').endswith('q=70'))
+            self.assertIn('q=70.0', build_imgix_url('/media/a.jpg', q=70.0))
+            self.assertIn('w=1', build_imgix_url('/media/a.jpg', 'w1'))
+            self.assertIn('w=True', build_imgix_url('/media/a.jpg', w=True))
+
+
+    def test_stale_manifest_is_rejected(self):
+
+        with self.settings():
+            self.build_manifest()
+        with self.settings(IMGIX_DOMAINS='test2.imgix.net'):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                url = build_imgix_url('/static/logo.png')
+                build_imgix_url('/static/logo.png')
+            self.assertEqual(url, 'https://test2.imgix.net/static/logo.png?ixlib=python-{0}'.format(__version__))
+            self.assertEqual(len(caught), 1)
+            self.assertIs(caught[0].category, StaleManifestWarning)
+            self.assertIn('built with other settings', str(caught[0].message))
+
+
+    def test_missing_manifest(self):
+
+        with self.settings():
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                url = build_imgix_url('/static/logo.png')
+            self.assertEqual(url, 'https://test1.imgix.net/static/logo.png?ixlib=python-{0}'.format(__version__))
+            self.assertIs(caught[0].category, StaleManifestWarning)
+
+
+    def test_command_errors(self):
+
+        with self.settings(IMGIX_MANIFEST=None):
+            with self.assertRaises(CommandError):
+                self.build_manifest()
+        with self.settings():
+            with self.assertRaises(CommandError):
+                self.build_manifest(aliases=['thumb'])
+        with self.settings(IMGIX_MANIFEST_IMAGES=[('/static/a.png', 'nope')]):
+            with self.assertRaises(CommandError):
+                self.build_manifest()
+        with self.settings(IMGIX_DOMAINS=['test1.imgix.net', 'test2.imgix.net'],
+                           IMGIX_SHARD_STRATEGY='cycle'):
+            with self.assertRaises(CommandError):
+                self.build_manifest()
+
+
+# Modules that loading the template tags must not import
+DEFERRED_MODULES = [
+    'imgix', 'django_imgix.buckets', 'django_imgix.engine',
+    'django_imgix.manifest', 'django_imgix.metrics',
+]
+
+
+def run_importtime(code, **settings):
+    """
+    Run code in a new interpreter with ``-X importtime``. Return the set of
+    modules loaded at the end, and a dict of the modules whose import was
+    timed (those imported with an import statement) to their cumulative
+    import time in microseconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='django_imgix.tests.settings')
+    if settings:
+        env.pop('DJANGO_SETTINGS_MODULE')
+        code = 'from django.conf import settings; ' \
+               'settings.configure(**{0!r}); {1}'.format(settings, code)
+    code += '; import json, sys; print(json.dumps(sorted(sys.modules)))'
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=root, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise AssertionError(stderr.decode('utf-8'))
+
+    times = {}
+    for line in stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            times[parts[2].strip()] = int(parts[1])
+        except (IndexError, ValueError):
+            continue
+    return set(json.loads(stdout.decode('utf-8'))), times
+
+
+# Tests related to the import and first-call cost of the template tags
+@skipIf(sys.version_info < (3, 7), "-X importtime requires Python 3.7")
+class ImportTimeTests(TestCase):
+
+
+    def test_template_tags_defer_heavy_imports(self):
+
+        modules, times = run_importtime(
+            'import django; django.setup(); '
+            'import django_imgix.templatetags.imgix_tags'
+        )
+        self.assertIn('django_imgix.templatetags.imgix_tags', times)
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, modules)
+            self.assertNotIn(module, times)
+
+
+    def test_first_url_imports_what_is_configured(self):
+
+        modules, times = run_importtime(
+            'import django; django.setup(); '
+            'from django_imgix import build_imgix_url; '
+            'build_imgix_url("/image.jpg")',
+            INSTALLED_APPS=['django_imgix'], IMGIX_DOMAINS='test1.imgix.net'
+        )
+        self.assertIn('imgix', modules)
+        self.assertNotIn('django_imgix.engine', modules)
+        self.assertNotIn('django_imgix.metrics', modules)
+
+
+    def test_warm_up(self):
+
+        modules, times = run_importtime(
+            'import django; django.setup()',
+            INSTALLED_APPS=['django_imgix'], IMGIX_DOMAINS='test1.imgix.net',
+            IMGIX_URL_ENGINE='native', IMGIX_WARM_UP=True
+        )
+        self.assertIn('imgix', modules)
+        self.assertIn('django_imgix.engine', modules)
+
+
+class WarmUpTests(TestCase):
+
+
+    def test_warm_up_loads_manifest(self):
+
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_MANIFEST='/nonexistent/imgix-manifest.json'):
+            config = get_config()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                config.warm_up()
+                build_imgix_url('/image.jpg')
+            self.assertEqual(len(caught), 1)
+            self.assertEqual(config.manifest._urls, {})
+
+
+    @skipIf(apps is None, "app configs require Django 1.7")
+    def test_ready_warms_up(self):
+
+        app_config = apps.get_app_config('django_imgix')
+        with self.settings(IMGIX_DOMAINS='test1.imgix.net',
+                           IMGIX_WARM_UP=True):
+            with mock.patch('django_imgix.conf.ImgixConfig.warm_up') as warm_up:
+                app_config.ready()
+            self.assertEqual(warm_up.call_count, 1)
+        with self.settings(IMGIX_WARM_UP=True):
+            with self.assertRaises(ImproperlyConfigured):
+                app_config.ready()
+
+
+# Tests related to the imgix_picture template tag
+class PictureTests(TestCase):
+
+    def settings(self, **kwargs):
+        options = {
+            'IMGIX_DOMAINS': 'test1.imgix.net',
+            'IMGIX_SRCSET_WIDTHS': [320, 640],
+            'IMGIX_ALIASES': {'thumb': {'w': 320, 'h': 160, 'fit': 'crop'}},
+        }
+        options.update(kwargs)
+        return super(PictureTests, self).settings(**options)
+
+    def expected_picture(self, image_url, formats=('avif', 'webp')):
+        # The parameters of the 'thumb' alias
+        params = {'w': 320, 'h': 160, 'fit': 'crop'}
+        sources = ''.join(
+            '<source type="image/{0}" srcset="{1}">'.format(
+                fm, build_imgix_srcset(image_url, fm=fm, **params))
+            for fm in formats
+        )
+        return '<picture>{0}<img src="{1}" srcset="{2}" alt=""></picture>'.format(
+            sources, build_imgix_url(image_url, 'thumb'),
+            build_imgix_srcset(image_url, 'thumb'))
+
+
+    def test_picture_is_rendered(self):
+
+        with self.settings():
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% imgix_picture 'media/image/image_0001.jpg' 'thumb' %}"
+            )
+            self.assertEqual(
+                rendered,
+                self.expected_picture('media/image/image_0001.jpg')
+            )
+            self.assertIn(
+                '<source type="image/avif" srcset="https://test1.imgix.net/media/image/image_0001.jpg?fit=crop&fm=avif&h=160&ixlib=python-{0}&w=320 320w, '.format(__version__),
+                rendered
+            )
+
+
+    def test_formats_and_attributes(self):
+
+        with self.settings(IMGIX_PICTURE_FORMATS=['webp'],
+                           IMGIX_DETECT_FORMAT=True):
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% imgix_picture 'media/image/image_0001.png' w=320 h=160 alt=name sizes='50vw' loading='lazy' %}",
+                {'name': 'Tom & Jerry'}
+            )
+            self.assertEqual(
+                rendered,
+                '<picture><source type="image/webp" srcset="{0}" sizes="50vw">'
+                '<img src="{1}" srcset="{2}" sizes="50vw" alt="Tom &amp; Jerry" loading="lazy">'
+                '</picture>'.format(
+                    build_imgix_srcset('media/image/image_0001.png', w=320, h=160, fm='webp'),
+                    build_imgix_url('media/image/image_0001.png', w=320, h=160),
+                    build_imgix_srcset('media/image/image_0001.png', w=320, h=160))
+            )
+            self.assertIn('fm=png', rendered)
+
+            rendered = render_template(
+                "{% load imgix_tags %}"
+                "{% imgix_picture 'media/image/image_0001.jpg' 'thumb' formats='jxl, avif' %}"
+            )
+            self.assertEqual(
+                rendered,
+                self.expected_picture('media/image/image_0001.jpg',
+                                      formats=['jxl', 'avif'])
+            )
+
+
+    def test_invalid_formats(self):
+
+        with self.settings():
+            with self.assertRaises(TemplateSyntaxError):
+                render_template(
+                    "{% load imgix_tags %}"
+                    "{% imgix_picture 'media/image/image_0001.jpg' formats='avif,tiff' %}"
+                )
+        with self.settings(IMGIX_PICTURE_FORMATS=['heic']):
+            with self.assertRaises(ImproperlyConfigured):
+                get_config()
+
+
+    def test_picture_uses_one_round_trip(self):
+
+        with self.settings(CACHES=SHARED_CACHES, IMGIX_CACHE='imgix'):
+            get_cache('imgix').clear()
+            cache = get_cache('imgix')
+            cache.calls = []
+            html = build_imgix_picture('media/image/image_0001.jpg', 'thumb',
+                                       attrs={'alt': 'Image'})
+            self.assertEqual(cache.calls, ['get_many', 'set_many'])
+            self.assertIn(' alt="Image"', html)
+
+            with mock.patch.object(get_config(), 'build_url') as build_url:
+                self.assertEqual(
+                    build_imgix_picture('media/image/image_0001.jpg', 'thumb',
+                                        attrs={'alt': 'Image'}),
+                    html
+                )
+                self.assertFalse(build_url.called)
+
+
+    def test_picture_in_batch(self):
+
+        with self.settings():
+            expected = render_template(
+                "{% load imgix_tags %}"
+                "{% for path in paths %}{% imgix_picture path 'thumb' alt='' %}{% endfor %}",
+                {'paths': ['a.jpg', 'b.jpg']}
+            )
+            with mock.patch.object(get_config(), 'create_urls',
+                                   wraps=get_config().create_urls) as create_urls:
+                rendered = render_template(
+                    "{% load imgix_tags %}{% imgix_batch %}"
+                    "{% for path in paths %}{% imgix_picture path 'thumb' alt='' %}{% endfor %}"
+                    "{% end_imgix_batch %}",
+                    {'paths': ['a.jpg', 'b.jpg']}
+                )
+            self.assertEqual(rendered, expected)
+            # 1 src and 2 widths for each of avif, webp and the fallback
+            self.assertEqual(create_urls.call_count, 1)
+            self.assertEqual(len(create_urls.call_args[0][0]), 2 * 7)